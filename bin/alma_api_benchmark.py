@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+#
+# Run the script with it's -h option to see it's description
+# and usage or scroll down at bit
+#
+# Initial version 10/17/26 TME
+# Last updated 10/17/26 TME
+
+#
+# Load modules, set/initialize global variables
+#
+import os, sys
+from time import time
+from requests.adapters import HTTPAdapter
+
+# To help find other directories that might hold modules or config files
+binDir = os.path.dirname(os.path.realpath(__file__))
+
+# Find and load any of our modules that we need
+commonLib = binDir.replace('bin', 'lib')
+sys.path.append(commonLib)
+from almatools import urlAlmaApi
+from alma_api import api_session
+from api_json import backends, use_backend
+from api_metrics import api_metrics
+from rate_limiter import rate_limiter
+
+tests = ('get_bib', 'get_bibs', 'get_bibs_bulk', 'get_bib_tree', 'lookup_by_barcode', 'analytics_report', 'run_jobs')
+
+# run_script
+# Checked usage, run main script and then display result
+# Used when the script is called from the command prompt
+def run_script():
+	import argparse
+
+	usageMsg = """
+	Measure api_session against the local Alma API stand-in (alma_api_mock.py).
+	Requests that api_session makes to the Alma API url in main.yaml are sent
+	to the stand-in instead. Reports requests per second, p50/p99 latency,
+	retries and status codes.
+	"""
+
+	parser = argparse.ArgumentParser(description=usageMsg)
+	parser.add_argument("test", choices = tests, help = "api_session method to measure")
+	parser.add_argument("-u", "--url", default = 'http://127.0.0.1:8765/almaws/v1/', help = "Url of the stand-in API, defaults to http://127.0.0.1:8765/almaws/v1/")
+	parser.add_argument("-n", "--count", type = int, default = 500, help = "Number of records, report rows or jobs to request, defaults to 500")
+	parser.add_argument("-c", "--concurrency", type = int, default = 4, help = "Worker threads for batch methods, defaults to 4")
+	parser.add_argument("-s", "--session_type", choices = ('json', 'xml'), default = 'xml', help = "Session type, defaults to xml")
+	parser.add_argument("-r", "--rate", type = float, default = 0, help = "Rate limit, requests per second. Defaults to no rate limit.")
+	parser.add_argument("-m", "--metrics", help = "Write the api_metrics json to this file")
+	parser.add_argument("-j", "--json_backend", choices = sorted(backends), help = "JSON library to decode with, defaults to the fastest installed")
+	args = parser.parse_args()
+
+	if args.json_backend:
+		use_backend(args.json_backend)
+
+	benchmark(args.test, args.url, args.count, args.concurrency, args.session_type, args.rate, args.metrics)
+
+# Send requests meant for Alma to the stand-in API instead
+class stand_in_adapter(HTTPAdapter):
+
+	def __init__(self, standInUrl, poolSize):
+		super().__init__(pool_maxsize = poolSize)
+		self.standInUrl = standInUrl
+
+	def send(self, request, **kwargs):
+		if request.url.startswith(urlAlmaApi):
+			request.url = self.standInUrl + request.url[len(urlAlmaApi):]
+		return super().send(request, **kwargs)
+
+# Run a benchmark test and print the results
+def benchmark(test, standInUrl, count, concurrency, sessionType, rate, metricsFile):
+	latencies = []
+	metrics   = api_metrics()
+	failed    = 0
+
+	almaSession = api_session(sessionType, 'benchmark')
+	almaSession.poolSize = max(concurrency, 10)
+	almaSession.mount(urlAlmaApi, stand_in_adapter(standInUrl, almaSession.poolSize))
+	almaSession.add_hook(metrics)
+	almaSession.add_hook(lambda session, method, url, response, elapsed: latencies.append(elapsed))
+
+	# Don't draw from the rate limit shared with our other scripts
+	if rate:
+		almaSession.rateLimiter = rate_limiter(rate, f'/tmp/alma_api_benchmark_{os.getpid()}')
+	else:
+		almaSession.rateLimiter = False
+
+	mmsIds   = [f'99{number:010d}' for number in range(1, count + 1)]
+	barcodes = [f'320442301{number:04d}{mmsId}' for number, mmsId in enumerate(mmsIds, 1)]
+
+	startTime = time()
+
+	if test == 'get_bib':
+		for mmsId in mmsIds:
+			almaSession.get_bib(mmsId)
+			if almaSession.error: failed += 1
+
+	elif test == 'get_bibs':
+		for (mmsId, statusCode, text, error) in almaSession.get_bibs(mmsIds, concurrency):
+			if error: failed += 1
+
+	elif test == 'get_bibs_bulk':
+		for (mmsId, statusCode, text, error) in almaSession.get_bibs_bulk(mmsIds, concurrency):
+			if error: failed += 1
+
+	elif test == 'get_bib_tree':
+		for mmsId in mmsIds:
+			if not almaSession.get_bib_tree(mmsId, False, concurrency): failed += 1
+
+	elif test == 'lookup_by_barcode':
+		for barcode in barcodes:
+			almaSession.lookup_by_barcode(barcode)
+			if almaSession.error: failed += 1
+
+	elif test == 'analytics_report':
+		if sessionType != 'xml':
+			print('analytics_report needs a xml session')
+			return
+		rows = sum(1 for row in almaSession.analytics_report('/shared/benchmark', limit = 1000))
+		if almaSession.error: failed += 1
+		print(f'{rows} report rows read')
+
+	elif test == 'run_jobs':
+		for result in almaSession.run_jobs([f'M{number}' for number in range(count)], pollWait = 0.1, maxPollWait = 1):
+			if result['error']: failed += 1
+
+	elapsed = time() - startTime
+
+	# Report results
+	latencies.sort()
+	requests = len(latencies)
+	print(f'{test}: {count} records in {elapsed:.2f} seconds, {count / elapsed:.1f} records/second, {failed} failed')
+	if requests:
+		print(f'{requests} http requests, {requests / elapsed:.1f} requests/second')
+		print(f'Latency p50 {latencies[int(requests * 0.50)]:.3f}s, p99 {latencies[min(requests - 1, int(requests * 0.99))]:.3f}s, max {latencies[-1]:.3f}s')
+	print(metrics.summary())
+
+	if metricsFile:
+		metrics.dump(metricsFile)
+
+#
+# Run script, with usage check, if called from the command prompt
+#
+if __name__ == '__main__':
+	run_script()
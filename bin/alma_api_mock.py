@@ -0,0 +1,517 @@
+#!/usr/bin/env python3
+#
+# Run the script with it's -h option to see it's description
+# and usage or scroll down at bit
+#
+# Initial version 10/17/26 TME
+# Last updated 10/17/26 TME
+
+#
+# Load modules, set/initialize global variables
+#
+import gzip, json, random, re, threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from time import sleep, time
+from urllib.parse import parse_qs, urlparse
+from xml.sax.saxutils import escape
+
+apiRoot = '/almaws/v1/'
+
+# Settings, set from the command line
+latency         = 0.05
+latencyJitter   = 0.02
+errorRate       = 0.0
+perSecondLimit  = 0
+holdingsPerBib  = 2
+itemsPerHolding = 3
+reportRows      = 5000
+jobPolls        = 3
+userCount       = 250
+requestCount    = 500
+invoiceCount    = 200
+gzipMinBytes    = 1024
+
+# Track requests per second for throttling, API calls used and job instance polls
+lock          = threading.Lock()
+currentSecond = 0
+secondCount   = 0
+callsUsed     = 0
+jobInstances  = {}
+cancelled     = set()
+
+# IDs are built so that a record's parents can be found from its ID
+#   holding ID  22 + holding number (2 digits) + MMS ID
+#   item PID    23 + holding number (2 digits) + item number (4 digits) + MMS ID
+#   barcode     32044 + item PID
+reHoldingId = re.compile(r'^22(\d{2})(\d+)$')
+reItemPid   = re.compile(r'^23(\d{2})(\d{4})(\d+)$')
+
+# run_script
+# Checked usage, run main script and then display result
+# Used when the script is called from the command prompt
+def run_script():
+	import argparse
+	global latency, latencyJitter, errorRate, perSecondLimit, holdingsPerBib, itemsPerHolding, reportRows, jobPolls, gzipMinBytes, userCount, requestCount, invoiceCount
+
+	usageMsg = """
+	Run a local stand-in for the parts of Alma's API used by api_session: bibs,
+	holdings, items, items by barcode, users, user requests, requested resources,
+	vendors, PO lines, invoices, jobs and analytics reports. Responses
+	are made up from the IDs requested. Use it with alma_api_benchmark.py to
+	measure api_session changes without going against the real Alma.
+	"""
+
+	parser = argparse.ArgumentParser(description=usageMsg)
+	parser.add_argument("-p", "--port", type = int, default = 8765, help = "Port to listen on, defaults to 8765")
+	parser.add_argument("-l", "--latency", type = float, default = latency, help = f"Seconds added to every response, defaults to {latency}")
+	parser.add_argument("-j", "--jitter", type = float, default = latencyJitter, help = f"Random seconds, up to this amount, added to the latency, defaults to {latencyJitter}")
+	parser.add_argument("-e", "--error_rate", type = float, default = errorRate, help = "Fraction of requests, 0 to 1, that fail with a 500 error")
+	parser.add_argument("-t", "--throttle", type = int, default = perSecondLimit, help = "Requests per second allowed before returning 429 PER_SECOND_THRESHOLD errors")
+	parser.add_argument("--holdings", type = int, default = holdingsPerBib, help = f"Holdings per bib, defaults to {holdingsPerBib}")
+	parser.add_argument("--items", type = int, default = itemsPerHolding, help = f"Items per holding, defaults to {itemsPerHolding}")
+	parser.add_argument("--report_rows", type = int, default = reportRows, help = f"Rows in analytics reports, defaults to {reportRows}")
+	parser.add_argument("--gzip_min", type = int, default = gzipMinBytes, help = f"Gzip bodies of at least this many bytes when the client accepts gzip, 0 to never gzip. Defaults to {gzipMinBytes}")
+	parser.add_argument("--users", type = int, default = userCount, help = f"Users in the users list, defaults to {userCount}")
+	parser.add_argument("--requests", type = int, default = requestCount, help = f"User requests on each circulation desk, one per requested resource, defaults to {requestCount}")
+	parser.add_argument("--invoices", type = int, default = invoiceCount, help = f"Invoices, each with a few lines, defaults to {invoiceCount}")
+	parser.add_argument("--job_polls", type = int, default = jobPolls, help = f"Polls before a job instance completes, defaults to {jobPolls}")
+	args = parser.parse_args()
+
+	latency         = args.latency
+	latencyJitter   = args.jitter
+	errorRate       = args.error_rate
+	perSecondLimit  = args.throttle
+	holdingsPerBib  = args.holdings
+	itemsPerHolding = args.items
+	reportRows      = args.report_rows
+	jobPolls        = args.job_polls
+	gzipMinBytes    = args.gzip_min
+	userCount       = args.users
+	requestCount    = args.requests
+	invoiceCount    = args.invoices
+
+	server = ThreadingHTTPServer(('127.0.0.1', args.port), alma_api_mock)
+	server.daemon_threads = True
+	print(f'Alma API stand-in listening on http://127.0.0.1:{args.port}{apiRoot}')
+
+	try:
+		server.serve_forever()
+	except KeyboardInterrupt:
+		server.server_close()
+
+# Returns False if the request is under the per second threshold, otherwise True
+def is_throttled():
+	global currentSecond, secondCount
+
+	if not perSecondLimit:
+		return False
+
+	with lock:
+		second = int(time())
+		if second != currentSecond:
+			currentSecond = second
+			secondCount   = 0
+		secondCount += 1
+		return secondCount > perSecondLimit
+
+class alma_api_mock(BaseHTTPRequestHandler):
+
+	protocol_version = 'HTTP/1.1'
+
+	# Send each response in one write, otherwise delayed ACKs add 40ms to every request
+	wbufsize = -1
+	disable_nagle_algorithm = True
+
+	def log_message(self, format, *args):
+		pass
+
+	def do_GET(self):
+		self.handle_request('get')
+
+	def do_PUT(self):
+		self.handle_request('put')
+
+	def do_POST(self):
+		self.handle_request('post')
+
+	def do_DELETE(self):
+		self.handle_request('delete')
+
+	# Route the request to the matching endpoint
+	def handle_request(self, method):
+		global callsUsed
+
+		# Always read the request body so the connection can be reused
+		length = int(self.headers.get('Content-Length', 0))
+		body   = self.rfile.read(length) if length else b''
+
+		self.json = 'json' in self.headers.get('Accept', '')
+		url       = urlparse(self.path)
+		params    = {name: values[0] for name, values in parse_qs(url.query).items()}
+		path      = url.path[len(apiRoot):].strip('/').split('/') if url.path.startswith(apiRoot) else []
+
+		sleep(latency + random.uniform(0, latencyJitter))
+
+		if is_throttled():
+			return self.send_error_message(429, 'PER_SECOND_THRESHOLD', 'HTTP requests are more than allowed per second')
+		if errorRate and random.random() < errorRate:
+			return self.send_error_message(500, 'INTERNAL_SERVER_ERROR', 'Injected error')
+
+		with lock:
+			callsUsed += 1
+
+		try:
+			if path[:1] == ['bibs'] and len(path) == 1 and method == 'get':
+				return self.get_bib_list(params.get('mms_id', '').split(','))
+			if path[:1] == ['bibs'] and len(path) == 2:
+				return self.send_record(method, body, self.bib(path[1]))
+			if path[:1] == ['bibs'] and len(path) == 3 and path[2] == 'holdings':
+				return self.get_holdings_list(path[1])
+			if path[:1] == ['bibs'] and len(path) == 4 and path[2] == 'holdings':
+				return self.send_record(method, body, self.holding(path[1], path[3]))
+			if path[:1] == ['bibs'] and len(path) == 5 and path[4] == 'items':
+				return self.get_items_list(path[1], path[3], int(params.get('limit', 10)), int(params.get('offset', 0)))
+			if path[:1] == ['bibs'] and len(path) == 6 and path[4] == 'items':
+				return self.send_record(method, body, self.item(path[5]))
+			if path == ['items'] and 'item_barcode' in params:
+				return self.redirect_barcode(params['item_barcode'])
+			if path == ['users'] and method == 'get':
+				return self.get_users_list(int(params.get('limit', 10)), int(params.get('offset', 0)))
+			if path[:1] == ['users'] and len(path) == 4 and path[2] == 'requests':
+				return self.user_request(method, body, path[1], path[3])
+			if path == ['task-lists', 'requested-resources'] and method == 'get':
+				return self.get_requested_resources(params['library'], params['circ_desk'], int(params.get('limit', 10)), int(params.get('offset', 0)))
+			if path[:1] == ['users'] and len(path) == 2:
+				return self.send_record(method, body, self.user(path[1]))
+			if path[:1] == ['acq'] and method == 'get':
+				return self.get_acq(path[1:], int(params.get('limit', 10)), int(params.get('offset', 0)))
+			if path[:2] == ['conf', 'jobs'] and len(path) == 3 and method == 'post':
+				return self.start_job(path[2])
+			if path[:2] == ['conf', 'jobs'] and len(path) == 5 and path[3] == 'instances':
+				return self.get_job_instance(path[2], path[4])
+			if path[:2] == ['analytics', 'reports']:
+				return self.get_report(params)
+		except (ValueError, KeyError):
+			return self.send_error_message(400, '402203', f'Input parameters {self.path} are not valid')
+
+		return self.send_error_message(404, '404', f'No stand-in for {method.upper()} {self.path}')
+
+	#
+	# Responses
+	#
+
+	def send_body(self, statusCode, body, headers = {}):
+		if isinstance(body, str):
+			body = body.encode('utf-8')
+
+		# Alma compresses responses for clients that accept gzip
+		compress = gzipMinBytes and len(body) >= gzipMinBytes and 'gzip' in self.headers.get('Accept-Encoding', '')
+		if compress:
+			body = gzip.compress(body, 6)
+
+		self.send_response(statusCode)
+		self.send_header('Content-Type', 'application/json' if self.json else 'application/xml')
+		if compress:
+			self.send_header('Content-Encoding', 'gzip')
+		self.send_header('Content-Length', str(len(body)))
+		self.send_header('X-Remaining-API-Calls', str(max(0, 1000000 - callsUsed)))
+		for name, value in headers.items():
+			self.send_header(name, value)
+		self.end_headers()
+		self.wfile.write(body)
+
+	def send_error_message(self, statusCode, errorCode, errorMessage):
+		if self.json:
+			body = json.dumps({'errorsExist': True, 'errorList': {'error': [{'errorCode': errorCode, 'errorMessage': errorMessage, 'trackingId': 'mock'}]}})
+		else:
+			body = ('<web_service_result xmlns="http://com/exlibris/urm/general/xmlbeans"><errorsExist>true</errorsExist>'
+			        f'<errorList><error><errorCode>{errorCode}</errorCode><errorMessage>{escape(errorMessage)}</errorMessage>'
+			        '<trackingId>mock</trackingId></error></errorList></web_service_result>')
+
+		headers = {'Retry-After': '1'} if statusCode == 429 else {}
+		self.send_body(statusCode, body, headers)
+
+	# Records are (json, xml) pairs. A PUT returns what was sent.
+	def send_record(self, method, body, record):
+		if record is False:
+			return self.send_error_message(400, '402203', 'Record not found')
+		if method == 'put' and body:
+			return self.send_body(200, body)
+
+		(jsonRecord, xmlRecord) = record
+		if self.json:
+			self.send_body(200, json.dumps(jsonRecord), {'ETag': f'"{hash(xmlRecord)}"'})
+		else:
+			self.send_body(200, f'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n{xmlRecord}', {'ETag': f'"{hash(xmlRecord)}"'})
+
+	def get_bib_list(self, mmsIds):
+		bibs = [self.bib(mmsId) for mmsId in mmsIds if mmsId.isdigit()]
+
+		if self.json:
+			self.send_body(200, json.dumps({'bib': [bib[0] for bib in bibs], 'total_record_count': len(bibs)}))
+		else:
+			self.send_body(200, f'<bibs total_record_count="{len(bibs)}">' + ''.join(bib[1] for bib in bibs) + '</bibs>')
+
+	def get_holdings_list(self, mmsId):
+		holdings = [self.holding(mmsId, f'22{number:02d}{mmsId}', brief = True) for number in range(1, holdingsPerBib + 1)]
+
+		if self.json:
+			self.send_body(200, json.dumps({'holding': [holding[0] for holding in holdings], 'total_record_count': len(holdings)}))
+		else:
+			self.send_body(200, f'<holdings total_record_count="{len(holdings)}">' + ''.join(holding[1] for holding in holdings) + '</holdings>')
+
+	def get_items_list(self, mmsId, holdingId, limit, offset):
+		if holdingId == 'ALL':
+			holdingNumbers = range(1, holdingsPerBib + 1)
+		else:
+			holdingNumbers = [int(reHoldingId.match(holdingId).group(1))]
+
+		pids  = [f'23{holding:02d}{number:04d}{mmsId}' for holding in holdingNumbers for number in range(1, itemsPerHolding + 1)]
+		items = [self.item(pid) for pid in pids[offset:offset + min(limit, 100)]]
+
+		if self.json:
+			self.send_body(200, json.dumps({'item': [item[0] for item in items], 'total_record_count': len(pids)}))
+		else:
+			self.send_body(200, f'<items total_record_count="{len(pids)}">' + ''.join(item[1] for item in items) + '</items>')
+
+	def get_users_list(self, limit, offset):
+		users = [self.user(f'mock{number:06d}', brief = True) for number in range(offset + 1, min(userCount, offset + min(limit, 100)) + 1)]
+
+		if self.json:
+			self.send_body(200, json.dumps({'user': [user[0] for user in users], 'total_record_count': userCount}))
+		else:
+			self.send_body(200, f'<users total_record_count="{userCount}">' + ''.join(user[1] for user in users) + '</users>')
+
+	# Requests that have been cancelled drop off the list
+	def get_requested_resources(self, library, circDesk, limit, offset):
+		with lock:
+			requestIds = [f'7{number:09d}' for number in range(1, requestCount + 1) if f'7{number:09d}' not in cancelled]
+		requests = [self.user_request_record(requestId, library, circDesk) for requestId in requestIds[offset:offset + min(limit, 100)]]
+
+		if self.json:
+			resources = [{'resource_metadata': {'mms_id': {'value': request['mms_id']}, 'title': request['title']},
+			              'location': {'library': {'value': library}}, 'request': [request]} for request in requests]
+			self.send_body(200, json.dumps({'requested_resource': resources, 'total_record_count': len(requestIds)}))
+		else:
+			resources = ''.join(f"<requested_resource><resource_metadata><mms_id>{request['mms_id']}</mms_id><title>{request['title']}</title></resource_metadata>"
+			                    f"<location><library>{library}</library></location><request><id>{request['request_id']}</id>"
+			                    f"<user_primary_id>{request['user_primary_id']}</user_primary_id><request_type>{request['request_type']}</request_type>"
+			                    f"<destination><circulation_desk>{circDesk}</circulation_desk></destination></request></requested_resource>"
+			                    for request in requests)
+			self.send_body(200, f'<requested_resources total_record_count="{len(requestIds)}">{resources}</requested_resources>')
+
+	# Request IDs are 7 + request number (9 digits), requested by user
+	# number (request number % users) + 1
+	def user_request_record(self, requestId, library = 'WID', circDesk = 'DEFAULT_CIRC_DESK'):
+		number = int(requestId[1:])
+		mmsId  = f'99{number:010d}'
+		return {'request_id': requestId, 'id': requestId, 'user_primary_id': f'mock{(number % max(userCount, 1)) + 1:06d}',
+		        'request_type': 'HOLD', 'request_sub_type': {'value': 'PATRON_PHYSICAL'}, 'mms_id': mmsId, 'title': f'Title {mmsId}',
+		        'pickup_location_library': library, 'destination': {'circulation_desk': circDesk}, 'request_status': 'NOT_STARTED'}
+
+	def user_request(self, method, body, userId, requestId):
+		if not re.match(r'^7\d{9}$', requestId) or int(requestId[1:]) > requestCount:
+			return self.send_error_message(400, '401890', f'Request {requestId} not found')
+		with lock:
+			if requestId in cancelled:
+				return self.send_error_message(400, '401890', f'Request {requestId} not found')
+			if method == 'delete':
+				cancelled.add(requestId)
+				return self.send_body(204, '')
+
+		request = self.user_request_record(requestId)
+		if request['user_primary_id'] != userId:
+			return self.send_error_message(400, '401890', f'Request {requestId} not found for user {userId}')
+		if method == 'put' and body:
+			return self.send_body(200, body)
+		if self.json:
+			self.send_body(200, json.dumps(request))
+		else:
+			self.send_body(200, '<user_request>' + ''.join(f'<{name}>{value}</{name}>' for name, value in request.items() if not isinstance(value, dict)) + '</user_request>')
+
+	# Acquisitions are json only. Invoice N has (N % 5) + 1 lines, line L is
+	# for PO line POL-(N * 10 + L). There are 25 vendors.
+	def get_acq(self, path, limit, offset):
+		limit = min(limit, 100)
+
+		if path == ['vendors']:
+			return self.send_list('vendor', [self.vendor(number) for number in range(offset + 1, min(25, offset + limit) + 1)], 25)
+		if path == ['invoices']:
+			return self.send_list('invoice', [self.invoice(number) for number in range(offset + 1, min(invoiceCount, offset + limit) + 1)], invoiceCount)
+		if path[:1] == ['invoices'] and len(path) in (2, 3):
+			number = int(path[1])
+			if not 0 < number <= invoiceCount:
+				return self.send_error_message(400, '402880', f'Invoice {path[1]} not found')
+			if len(path) == 2:
+				return self.send_body(200, json.dumps(self.invoice(number)))
+			lines = [self.invoice_line(number, line) for line in range(1, (number % 5) + 2)]
+			return self.send_list('invoice_line', lines[offset:offset + limit], len(lines))
+		if path == ['po-lines']:
+			codes = [f'POL-{number * 10 + line}' for number in range(1, invoiceCount + 1) for line in range(1, (number % 5) + 2)]
+			return self.send_list('po_line', [self.po_line(code) for code in codes[offset:offset + limit]], len(codes))
+		if path[:1] == ['po-lines'] and len(path) == 2 and path[1].startswith('POL-'):
+			return self.send_body(200, json.dumps(self.po_line(path[1])))
+
+		return self.send_error_message(404, '404', f'No stand-in for acq/{"/".join(path)}')
+
+	def send_list(self, recordKey, records, total):
+		self.json = True
+		self.send_body(200, json.dumps({recordKey: records, 'total_record_count': total}))
+
+	def vendor(self, number):
+		return {'code': f'V{number:03d}', 'name': f'Vendor {number}', 'status': {'value': 'ACTIVE'}}
+
+	def invoice(self, number):
+		return {'id': str(number), 'number': f'INV-{number:06d}', 'vendor': {'value': f'V{(number % 25) + 1:03d}'},
+		        'invoice_date': f'2026-{(number % 12) + 1:02d}-01Z', 'invoice_status': {'value': 'ACTIVE'},
+		        'currency': {'value': 'USD'}, 'total_amount': 10.0 * ((number % 5) + 1)}
+
+	def invoice_line(self, number, line):
+		return {'id': f'{number}{line:03d}', 'number': str(line), 'po_line': f'POL-{number * 10 + line}',
+		        'status': {'value': 'READY'}, 'price': 10.0, 'total_price': 10.0}
+
+	def po_line(self, code):
+		return {'number': code, 'status': {'value': 'ACTIVE'}, 'vendor': {'value': 'V001'}, 'price': {'sum': '10.0', 'currency': {'value': 'USD'}}}
+
+	# Alma redirects a barcode lookup to the item's url
+	def redirect_barcode(self, barcode):
+		item = self.item(barcode[5:]) if barcode.startswith('32044') else False
+		if not item:
+			return self.send_error_message(400, '401689', f'No items found for barcode {barcode}.')
+
+		pid = item[0]['item_data']['pid']
+		location = f"{apiRoot}bibs/{item[0]['bib_data']['mms_id']}/holdings/{item[0]['holding_data']['holding_id']}/items/{pid}"
+		self.send_body(302, '', {'Location': location})
+
+	def start_job(self, jobId):
+		instanceId = f'{random.randint(1000000, 9999999)}'
+		with lock:
+			jobInstances[instanceId] = 0
+
+		link = f'http://{self.headers.get("Host")}{apiRoot}conf/jobs/{jobId}/instances/{instanceId}'
+		message = f'Job no. {instanceId} triggered on mock'
+		if self.json:
+			self.send_body(200, json.dumps({'id': jobId, 'additional_info': {'value': message, 'link': link}}))
+		else:
+			self.send_body(200, f'<job><id>{jobId}</id><additional_info link="{link}">{message}</additional_info></job>')
+
+	def get_job_instance(self, jobId, instanceId):
+		with lock:
+			polls = jobInstances.get(instanceId, jobPolls) + 1
+			jobInstances[instanceId] = polls
+
+		if polls >= jobPolls:
+			(status, progress) = ('COMPLETED_SUCCESS', 100)
+		else:
+			(status, progress) = ('RUNNING', int(100 * polls / jobPolls))
+
+		if self.json:
+			self.send_body(200, json.dumps({'id': instanceId, 'status': {'value': status}, 'progress': progress,
+			                                'counter': [{'type': {'value': 'c.jobs.processed'}, 'value': str(progress)}]}))
+		else:
+			self.send_body(200, f'<job_instance><id>{instanceId}</id><status>{status}</status><progress>{progress}</progress>'
+			                    f'<counter><type>c.jobs.processed</type><value>{progress}</value></counter></job_instance>')
+
+	# Analytics reports are always xml. The token is the offset of the next page.
+	def get_report(self, params):
+		limit  = min(int(params.get('limit', 25)), 1000)
+		offset = int(params.get('token', 0))
+		end    = min(reportRows, offset + limit)
+
+		schema = ''
+		if 'token' not in params and params.get('col_names') == 'true':
+			schema = ('<xsd:schema xmlns:xsd="http://www.w3.org/2001/XMLSchema" xmlns:saw-sql="urn:saw-sql"><xsd:complexType name="Row"><xsd:sequence>'
+			          '<xsd:element name="Column0" saw-sql:columnHeading="0"/><xsd:element name="Column1" saw-sql:columnHeading="MMS Id"/>'
+			          '<xsd:element name="Column2" saw-sql:columnHeading="Title"/></xsd:sequence></xsd:complexType></xsd:schema>')
+
+		rows = ''.join(f'<Row><Column0>0</Column0><Column1>99{row:010d}</Column1><Column2>Title {row}</Column2></Row>' for row in range(offset, end))
+		finished = 'true' if end >= reportRows else 'false'
+
+		self.json = False
+		self.send_body(200, f'<report><QueryResult><ResumptionToken>{end}</ResumptionToken><IsFinished>{finished}</IsFinished>'
+		                    f'<ResultXml><rowset xmlns="urn:schemas-microsoft-com:xml-analysis:rowset">{schema}{rows}</rowset></ResultXml>'
+		                    '</QueryResult></report>')
+
+	#
+	# Made up records
+	#
+
+	def bib(self, mmsId):
+		if not mmsId.isdigit():
+			return False
+
+		title  = f'Title {mmsId}'
+		record = (f'<record><leader>00000cam a2200000 a 4500</leader><controlfield tag="001">{mmsId}</controlfield>'
+		          f'<datafield tag="245" ind1="1" ind2="0"><subfield code="a">{title}</subfield></datafield></record>')
+		# Alma's json Bibs keep the XML declaration of their UTF-16 original
+		jsonBib = {'mms_id': mmsId, 'title': title, 'anies': ['<?xml version="1.0" encoding="UTF-16"?>' + record]}
+		xmlBib  = f'<bib><mms_id>{mmsId}</mms_id><title>{title}</title>{record}</bib>'
+
+		return (jsonBib, xmlBib)
+
+	def holding(self, mmsId, holdingId, brief = False):
+		match = reHoldingId.match(holdingId)
+		if not match or not mmsId.isdigit():
+			return False
+
+		callNumber = f'MOCK {match.group(1)}'
+		jsonHolding = {'holding_id': holdingId, 'library': {'value': 'WID', 'desc': 'Widener'},
+		               'location': {'value': 'GEN', 'desc': 'Stacks'}, 'call_number': callNumber}
+		xmlHolding  = (f'<holding><holding_id>{holdingId}</holding_id><library desc="Widener">WID</library>'
+		               f'<location desc="Stacks">GEN</location><call_number>{callNumber}</call_number>')
+
+		if not brief:
+			xmlHolding += (f'<record><leader>00000nx  a2200000zn 4500</leader><controlfield tag="001">{holdingId}</controlfield>'
+			               f'<datafield tag="852" ind1="0" ind2=" "><subfield code="b">WID</subfield><subfield code="c">GEN</subfield>'
+			               f'<subfield code="h">{callNumber}</subfield></datafield></record>')
+
+		return (jsonHolding, xmlHolding + '</holding>')
+
+	# User IDs are mock + user number (6 digits). A user was last modified
+	# on day (number % 28) + 1 of October 2026.
+	def user(self, primaryId, brief = False):
+		if not re.match(r'^mock\d{6}$', primaryId):
+			return False
+
+		number       = int(primaryId[4:])
+		lastModified = f'2026-10-{(number % 28) + 1:02d}Z'
+		jsonUser = {'primary_id': primaryId, 'first_name': 'Mock', 'last_name': f'User {number}',
+		            'user_group': {'value': 'STAFF'}, 'status': {'value': 'ACTIVE'}, 'last_modified_date': lastModified}
+		xmlUser  = (f'<user><primary_id>{primaryId}</primary_id><first_name>Mock</first_name><last_name>User {number}</last_name>'
+		            f'<user_group>STAFF</user_group><status>ACTIVE</status><last_modified_date>{lastModified}</last_modified_date>')
+
+		if not brief:
+			email = f'{primaryId}@example.edu'
+			jsonUser['contact_info'] = {'email': [{'email_address': email, 'preferred': True}]}
+			xmlUser += f'<contact_info><emails><email preferred="true"><email_address>{email}</email_address></email></emails></contact_info>'
+
+		return (jsonUser, xmlUser + '</user>')
+
+	def item(self, pid):
+		match = reItemPid.match(pid)
+		if not match:
+			return False
+
+		(holdingNumber, itemNumber, mmsId) = match.groups()
+		holdingId = f'22{holdingNumber}{mmsId}'
+		barcode   = f'32044{pid}'
+
+		jsonItem = {
+		            'bib_data':     {'mms_id': mmsId, 'title': f'Title {mmsId}'},
+		            'holding_data': {'holding_id': holdingId, 'call_number': f'MOCK {holdingNumber}'},
+		            'item_data':    {'pid': pid, 'barcode': barcode, 'policy': {'value': '01'},
+		                             'base_status': {'value': '1'}, 'process_type': {'value': ''},
+		                             'library': {'value': 'WID'}, 'location': {'value': 'GEN'}}
+		            }
+		xmlItem  = (f'<item><bib_data><mms_id>{mmsId}</mms_id><title>Title {mmsId}</title></bib_data>'
+		            f'<holding_data><holding_id>{holdingId}</holding_id><call_number>MOCK {holdingNumber}</call_number></holding_data>'
+		            f'<item_data><pid>{pid}</pid><barcode>{barcode}</barcode><policy>01</policy><base_status>1</base_status>'
+		            f'<process_type></process_type><library>WID</library><location>GEN</location></item_data></item>')
+
+		return (jsonItem, xmlItem)
+
+#
+# Run script, with usage check, if called from the command prompt
+#
+if __name__ == '__main__':
+	run_script()
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+#
+# Run the script with it's -h option to see it's description
+# and usage or scroll down at bit
+#
+# Initial version 10/17/26 TME
+# Last updated 10/17/26 TME
+
+#
+# Load modules, set/initialize global variables
+#
+import os, sys
+from glob import glob
+
+# To help find other directories that might hold modules or config files
+binDir = os.path.dirname(os.path.realpath(__file__))
+
+# Find and load any of our modules that we need
+commonLib = binDir.replace('bin', 'lib')
+sys.path.append(commonLib)
+from almatools import almaMirrorFile, almaOutputRoot
+from alma_mirror import alma_mirror
+from ltstools import get_date_time_stamp, reportMethod
+from notify import notify
+
+jobCode = 'load_alma_mirror'
+logDir  = binDir.replace('bin', 'log')
+
+# run_script
+# Checked usage, run main script and then display result
+# Used when the script is called from the command prompt
+def run_script():
+	import argparse
+
+	usageMsg = f"""
+	Load published Alma MARCXML exports, full or delta, gzipped or not, into the
+	local mirror used for barcode, holdings and bib lookups. Files are loaded
+	in the order given, so list a full export before its deltas. Relative
+	paths and wildcards are taken from {almaOutputRoot}.
+	"""
+
+	parser = argparse.ArgumentParser(description=usageMsg)
+	parser.add_argument("input_files", nargs = '+', help = "MARCXML export files to load")
+	parser.add_argument("-m", "--mirror_file", default = almaMirrorFile, help = "Mirror database to load, defaults to almaMirrorFile in main.yaml")
+	parser.add_argument("-b", "--batch_size", type = int, default = 5000, help = "Bibs written per transaction, defaults to 5000")
+	parser.add_argument("-v", "--verbose", action = 'store_true', help = "Run with verbose output")
+	args = parser.parse_args()
+
+	load_alma_mirror(args.input_files, args.mirror_file, args.batch_size, args.verbose)
+
+# Load export files into the mirror, reporting through notify
+def load_alma_mirror(inputFiles, mirrorFile, batchSize, verbose):
+	logFile  = f'{logDir}/{jobCode}_' + get_date_time_stamp('month')
+	notifyJM = notify(reportMethod, jobCode, logFile)
+	notifyJM.report('start')
+
+	if not mirrorFile:
+		notifyJM.log('fail', 'No mirror file given and almaMirrorFile is not set in main.yaml', verbose)
+		notifyJM.report('stopped')
+		return
+
+	# Expand wildcards, relative to the Alma output directory
+	files = []
+	for inputFile in inputFiles:
+		if not os.path.isabs(inputFile):
+			inputFile = os.path.join(almaOutputRoot, inputFile)
+		matches = sorted(glob(inputFile))
+		if not matches:
+			notifyJM.log('fail', f'{inputFile} not found', verbose)
+		files.extend(matches)
+
+	mirror = alma_mirror(mirrorFile)
+	for inputFile in files:
+		try:
+			counts = mirror.load_file(inputFile, batchSize)
+		except Exception as e:
+			notifyJM.log('fail', f'Failed to load {inputFile}: {e}', verbose)
+			continue
+
+		notifyJM.log('pass', f"Loaded {inputFile}: {counts['bibs']} bibs, {counts['holdings']} holdings and "
+		                     f"{counts['items']} items, {counts['deleted']} bibs deleted", verbose)
+
+	stats = mirror.stats()
+	notifyJM.log('pass', f"{mirrorFile} holds {stats['bibs']} bibs, {stats['holdings']} holdings and {stats['items']} items", verbose)
+	notifyJM.report('complete')
+
+#
+# Run script, with usage check, if called from the command prompt
+#
+if __name__ == '__main__':
+	run_script()
@@ -4,7 +4,7 @@
 # and usage or scroll down at bit
 #
 # Initial version 02/16/18 TME
-# Last updated 10/23/27 TME
+# Last updated 10/17/26 TME
 
 #
 # Load modules, set/initialize global variables
@@ -18,6 +18,7 @@ binDir = os.path.dirname(os.path.realpath(__file__))
 scriptLib = binDir.replace('bin', 'lib')
 sys.path.append(scriptLib)
 from notify import notify
+from jm_report import unpack_report
 
 # run_script
 # Checked usage, run main script and then display result
@@ -38,17 +39,38 @@ def run_script():
 			COMPLETED_SUCCESS
 			COMPLETED_WARNING
 			COMPLETED_FAILED
+
+	Updates that couldn't be sent are saved to an outbox. Use --replay
+	to send them once the Job Monitor is back.
+
+	Large reports may be posted as gzipped chunks to the same job run. Save
+	the chunks to files and use --unpack to put the report back together.
 	"""
 
     # Check for any command line parameters
     parser = argparse.ArgumentParser(description=usageMsg)
-    parser.add_argument("job_code", help = "Job code as defined in the Job Monitor")
-    parser.add_argument("status_code", help = "Status code as defined in the Job Monitor (see above)")
+    parser.add_argument("job_code", nargs = '?', help = "Job code as defined in the Job Monitor")
+    parser.add_argument("status_code", nargs = '?', help = "Status code as defined in the Job Monitor (see above)")
     parser.add_argument("-m", "--message", help = "Job result message to pass to the Job Monitor")
     parser.add_argument("-r", "--run_id", help = "Job run ID used to identify the job run in the Job Monitor")
     parser.add_argument("-n", "--no_retries", action = 'store_true', help = "Do not retry if Job Monitor fails to respond")
+    parser.add_argument("--replay", action = 'store_true', help = "Send the updates waiting in the outbox, oldest first")
+    parser.add_argument("--unpack", nargs = '+', metavar = 'CHUNK_FILE', help = "Put a chunked report back together from files holding its chunks")
+    parser.add_argument("-b", "--batch_size", type = int, default = 50, help = "Replayed updates between saves of the outbox, defaults to 50")
     args = parser.parse_args()
 
+    if args.replay:
+        (sent, waiting) = replay_outbox(args.batch_size)
+        print(f'{sent} Job Monitor updates sent, {waiting} still waiting')
+        return
+
+    if args.unpack:
+        print(unpack_files(args.unpack))
+        return
+
+    if not args.job_code or not args.status_code:
+        parser.error('job_code and status_code are required unless --replay or --unpack is used')
+
      # Required, job code and status code
     jobCode    = args.job_code
     statusCode = args.status_code
@@ -95,6 +117,34 @@ def notifyJM(jobCode, statusCode, message = 'none', runId = False, noRetries = F
 
 	return runId
 
+# replay_outbox
+# Send Job Monitor updates saved in the outbox while it was down
+#
+# Parameters
+#   batchSize     Updates sent between saves of the outbox
+#
+# Returns the number of updates sent and still waiting
+#
+def replay_outbox(batchSize = 50):
+	notifyJM = notify('monitor', 'notifyJM')
+	return notifyJM.replay_outbox(batchSize)
+
+# unpack_files
+# Put a report posted as chunks back together
+#
+# Parameters
+#   chunkFiles    Files holding the report's chunks, in any order
+#
+# Returns the report
+#
+def unpack_files(chunkFiles):
+	chunks = []
+	for chunkFile in chunkFiles:
+		with open(chunkFile) as chunk:
+			chunks.append(chunk.read())
+
+	return unpack_report(chunks)
+
 #    
 # Run script, with usage check, if called from the command prompt 
 #
@@ -4,13 +4,14 @@
 # and usage or scroll down at bit
 #
 # Initial version 03/25/22 TME
-# Last updated 10/23/27 TME
+# Last updated 10/17/26 TME
 
-import argparse
-from pymarc import MARCReader
+import argparse, gzip
+from pymarc import MARCReader, map_xml
 
 usageMsg  = """
-Parse specified file and print out
+Parse specified file and print out. Binary MARC and MARCXML (.xml) files
+are supported, either can be gzipped (.gz).
 """
 
 # Check for any command line parameters
@@ -25,12 +26,24 @@ if args.field:
 else:
 	searchField = False
 
+# Print out a record or just the field searched for
+def print_record(record):
+	if searchField:
+		for field in record.get_fields(searchField):
+			print(field)
+	else:
+		print(record)
+
 # Open marc file print out each record
-with open(inputFile, 'rb') as fh:
-	reader = MARCReader(fh, to_unicode=True)
-	for record in reader:        	
-		if searchField:
-			for field in record.get_fields(searchField):
-				print(field)
-		else:
-			print(record)
+if inputFile.endswith('.gz'):
+	fh = gzip.open(inputFile, 'rb')
+else:
+	fh = open(inputFile, 'rb')
+
+with fh:
+	if '.xml' in inputFile:
+		map_xml(print_record, fh)
+	else:
+		reader = MARCReader(fh, to_unicode=True)
+		for record in reader:        	
+			print_record(record)
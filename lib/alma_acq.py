@@ -0,0 +1,227 @@
+# Bulk client for Alma's Acquisitions API. Lists vendors, invoices and PO
+# lines with several offset pages requested at once, gets PO lines and
+# invoices concurrently and keeps a local SQLite index of PO line to invoice
+# lines so invoices loaded from EDI files can be reconciled without a
+# lookup per PO line.
+#
+# Example:
+#	acq = alma_acq(indexFile = f'{dataDir}/invoice_index.sqlite')
+#	acq.index_invoices({'invoice_workflow_status': 'ACTIVE'})
+#	for invoiceLine in acq.invoice_lines('POL-12345'):
+#		...
+#
+# Initial version 10/17/26 TME
+# Last updated 10/17/26 TME
+
+import sqlite3
+from time import time
+from urllib.parse import quote, urlencode
+from alma_api import api_session, maxRecordsPerRequest
+from almatools import urlAcqApi
+from api_json import loads as json_loads
+from alma_records import json_value
+from sqlite_db import parameter_chunks, placeholders, thread_connections
+
+class alma_acq:
+
+	# Parameters
+	#   almaSession   A json api_session to use. One is started if not given.
+	#   concurrency   Worker threads for list pages and records
+	#   indexFile     SQLite file for the PO line to invoice lines index
+	def __init__(self, almaSession = False, concurrency = 4, indexFile = False):
+		if not almaSession:
+			almaSession = api_session('json')
+		self.session     = almaSession
+		self.concurrency = concurrency
+		self.indexFile   = indexFile
+		self.connections = thread_connections(indexFile) if indexFile else False
+		self.failed      = []
+		self.error       = False
+
+		if indexFile:
+			db = self.connections.get()
+			with db:
+				db.execute("""create table if not exists invoice_lines (
+				              invoice_id text, line_id text, po_line text, invoice_number text, line_number text,
+				              vendor text, invoice_date text, invoice_status text, line_status text,
+				              price real, total_price real, currency text, indexed real,
+				              primary key (invoice_id, line_id))""")
+				db.execute('create index if not exists invoice_lines_po_line on invoice_lines (po_line)')
+
+	#
+	# Lists
+	#
+
+	# Get a page of a list. Returns (offset, statusCode, records, total or error).
+	def get_list_page(self, session, path, recordKey, offset, params = False):
+		session.use_api_key('acquisitions')
+		session.urlRequest = f'{urlAcqApi}{path}?limit={maxRecordsPerRequest}&offset={offset}'
+		if params:
+			session.urlRequest += '&' + urlencode(params, quote_via = quote)
+
+		session.api_request('get', session.urlRequest)
+		if session.error:
+			return (offset, session.statusCode, False, session.error)
+
+		recordList = json_loads(session.text)
+		return (offset, session.statusCode, recordList.get(recordKey) or [], int(recordList.get('total_record_count') or 0))
+
+	# List records. The first page gives the number of records, the rest of
+	# the pages are requested concurrently. Yields records as dictionaries.
+	# Pages that failed are added to self.failed as ('path offset N', error).
+	def list_records(self, path, recordKey, params = False):
+		(offset, statusCode, records, total) = self.get_list_page(self.session, path, recordKey, 0, params)
+		if records is False:
+			self.error = total
+			self.failed.append((f'{path} offset 0', total))
+			return
+
+		yield from records
+
+		def get_page(session, offset):
+			(offset, statusCode, records, total) = self.get_list_page(session, path, recordKey, offset, params)
+			if records is False:
+				return (offset, statusCode, False, total)
+			return (offset, statusCode, records, False)
+
+		offsets = range(maxRecordsPerRequest, total, maxRecordsPerRequest)
+		for (offset, statusCode, records, error) in self.session.run_batch(get_page, offsets, self.concurrency):
+			if error:
+				self.error = error
+				self.failed.append((f'{path} offset {offset}', error))
+				continue
+			yield from records
+
+	# List vendors. Params are Alma's vendors API filters, e.g. {'status': 'ACTIVE'}.
+	def list_vendors(self, params = False):
+		return self.list_records('vendors', 'vendor', params)
+
+	# List invoices, e.g. {'invoice_workflow_status': 'ACTIVE', 'vendor': 'YBP'}
+	def list_invoices(self, params = False):
+		return self.list_records('invoices', 'invoice', params)
+
+	# List PO lines, e.g. {'status': 'ACTIVE', 'q': 'vendor_account~YBP'}
+	def list_po_lines(self, params = False):
+		return self.list_records('po-lines', 'po_line', params)
+
+	#
+	# Records
+	#
+
+	# Get a PO line. Check session.error, the PO line is in session.text.
+	def get_po_line(self, session, poLineCode):
+		session.use_api_key('acquisitions')
+		session.urlRequest = f'{urlAcqApi}po-lines/{quote(poLineCode, safe = "")}'
+		session.api_request('get', session.urlRequest)
+
+	# Get an invoice. Check session.error, the invoice is in session.text.
+	def get_invoice(self, session, invoiceId):
+		session.use_api_key('acquisitions')
+		session.urlRequest = f'{urlAcqApi}invoices/{quote(invoiceId, safe = "")}?view=full'
+		session.api_request('get', session.urlRequest)
+
+	# Get all of an invoice's lines, a page at a time.
+	# Returns a list of invoice lines as dictionaries, or False with the
+	# error in session.error.
+	def get_invoice_lines(self, session, invoiceId):
+		path   = f'invoices/{quote(invoiceId, safe = "")}/lines'
+		lines  = []
+		offset = 0
+		while True:
+			(offset, statusCode, page, total) = self.get_list_page(session, path, 'invoice_line', offset)
+			if page is False:
+				return False
+			lines.extend(page)
+			offset += maxRecordsPerRequest
+			if not page or offset >= total:
+				return lines
+
+	# Get PO lines concurrently. Yields (poLineCode, statusCode, text, error)
+	# as each request completes.
+	def get_po_lines(self, poLineCodes):
+		def get_po_line(session, poLineCode):
+			self.get_po_line(session, poLineCode)
+			return (poLineCode, session.statusCode, session.text, session.error)
+
+		return self.session.run_batch(get_po_line, poLineCodes, self.concurrency)
+
+	# Get invoices concurrently. Yields (invoiceId, statusCode, text, error)
+	# as each request completes.
+	def get_invoices(self, invoiceIds):
+		def get_invoice(session, invoiceId):
+			self.get_invoice(session, invoiceId)
+			return (invoiceId, session.statusCode, session.text, session.error)
+
+		return self.session.run_batch(get_invoice, invoiceIds, self.concurrency)
+
+	#
+	# PO line to invoice lines index
+	#
+
+	# Add invoices' lines to the index, replacing any lines indexed for them
+	# before. Invoices are dictionaries from list_invoices, e.g.
+	# index_invoices(acq.list_invoices({'vendor': 'YBP'})), or a dictionary
+	# of list_invoices params. Lines are requested concurrently, an invoice
+	# per worker, and written in one transaction per invoice.
+	#
+	# Returns a dictionary with the number of invoices and lines indexed and
+	# a list of (invoiceId, error) for invoices that failed
+	def index_invoices(self, invoices = False):
+		counts = {'invoices': 0, 'lines': 0, 'failed': []}
+		self.failed = []
+		self.error  = False
+
+		if not self.indexFile:
+			self.error = 'No indexFile was given'
+			return counts
+
+		if not invoices or isinstance(invoices, dict):
+			invoices = self.list_invoices(invoices)
+
+		def index_invoice(session, invoice):
+			lines = self.get_invoice_lines(session, invoice['id'])
+			if lines is False:
+				return (invoice['id'], session.statusCode, False, session.error)
+
+			now  = time()
+			rows = [(invoice['id'], line.get('id'), line.get('po_line'), invoice.get('number'), line.get('number'),
+			         json_value(invoice.get('vendor')), invoice.get('invoice_date'), json_value(invoice.get('invoice_status')),
+			         json_value(line.get('status')), line.get('price'), line.get('total_price'),
+			         json_value(invoice.get('currency')), now) for line in lines]
+
+			db = self.connections.get()
+			with db:
+				db.execute('delete from invoice_lines where invoice_id = ?', (invoice['id'],))
+				db.executemany('insert into invoice_lines values (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)', rows)
+
+			return (invoice['id'], session.statusCode, len(rows), False)
+
+		for (invoiceId, statusCode, lines, error) in self.session.run_batch(index_invoice, invoices, self.concurrency):
+			if error or lines is False:
+				self.failed.append((invoiceId, error))
+				continue
+			counts['invoices'] += 1
+			counts['lines']    += lines
+
+		counts['failed'] = self.failed
+		return counts
+
+	# Returns the indexed invoice lines for a PO line as dictionaries
+	def invoice_lines(self, poLineCode):
+		db = self.connections.get()
+		db.row_factory = sqlite3.Row
+		return [dict(row) for row in db.execute('select * from invoice_lines where po_line = ? order by invoice_date, invoice_number', (poLineCode,))]
+
+	# Returns a dictionary of PO line: invoice lines for several PO lines,
+	# PO lines without invoice lines are left out
+	def invoice_lines_for(self, poLineCodes):
+		found = {}
+		db    = self.connections.get()
+		db.row_factory = sqlite3.Row
+
+		for chunk in parameter_chunks(poLineCodes):
+			query = f'select * from invoice_lines where po_line in ({placeholders(chunk)}) order by invoice_date, invoice_number'
+			for row in db.execute(query, chunk):
+				found.setdefault(row['po_line'], []).append(dict(row))
+
+		return found
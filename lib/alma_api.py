@@ -1,26 +1,216 @@
 # Use this class for working with the Alma's API
 #
 # Initial version 03/26/19 TME
-# Last updated 09/16/22 TME
+# Last updated 10/17/26 TME
 
-import os, sys, re
-from time import sleep
+import os, sys, gzip, threading
+from collections import namedtuple
+from concurrent.futures import Future, ThreadPoolExecutor, FIRST_COMPLETED
+from concurrent.futures import wait as wait_futures
+from itertools import islice
+from time import sleep, time
+from urllib.parse import quote, urlparse
+from lxml import etree
 from requests import Session
-from almatools import urlAlmaApi, urlBarcodeApi, urlBibsApi, urlJobsApi, apiKeyBibsRw
+from requests.adapters import HTTPAdapter
+from almatools import urlAlmaApi, urlAnalyticsApi, urlBarcodeApi, urlBibsApi, urlJobsApi, urlPatronApi, urlTaskListsApi, apiRateLimit, apiRateLimitFile
+from almatools import apiKeyAcquisitions, apiKeyAnalytics, apiKeyBibsRw, apiKeyJobs, apiKeyPatron, apiKeyUserRequest
+from almatools import apiCacheDir, apiCacheTtl, apiCacheMaxBytes, almaMirrorFile
+from api_cache import api_cache, barcode_cache
+import api_json
+from alma_mirror import alma_mirror
+from alma_records import holding_record, parse_error, parse_holdings, parse_items, parse_requested_resources
+from api_journal import api_journal
+from api_metrics import api_metrics
+from rate_limiter import rate_limiter
+from retry_policy import retry_policy, circuit_breaker
+
+# Alma's bibs API accepts up to 100 MMS IDs per request
+maxBibsPerRequest = 100
+
+# MARCXML namespace
+marcNs = 'http://www.loc.gov/MARC21/slim'
+
+# Alma's list APIs return up to 100 records per request
+maxRecordsPerRequest = 100
+
+# Holdings and items tree returned by get_bib_tree. Holdings and items
+# are alma_records holding_records and item_records.
+bib_tree = namedtuple('bib_tree', 'mmsId bib holdings')
+
+# Alma job instance statuses for jobs that have finished running
+jobEndStatuses = ('COMPLETED_SUCCESS', 'COMPLETED_NO_BULKS', 'COMPLETED_WARNING', 'COMPLETED_FAILED',
+                  'FAILED', 'ABORTED', 'SYSTEM_ABORTED', 'SKIPPED', 'MANUAL_HANDLING_REQUIRED')
+
+# API keys by API area. A session switches to the area's key as needed.
+apiKeys = {
+           'bibs':         apiKeyBibsRw,
+           'users':        apiKeyPatron,
+           'acquisitions': apiKeyAcquisitions,
+           'analytics':    apiKeyAnalytics,
+           'requests':     apiKeyUserRequest,
+           'jobs':         apiKeyJobs or apiKeyBibsRw
+           }
+
+# Job instance polls that can fail in a row before a job is given up on
+maxPollFailures = 5
+
+# All sessions, threads and scripts on this host share the same rate limit
+if apiRateLimit:
+	rateLimiter = rate_limiter(apiRateLimit, apiRateLimitFile)
+else:
+	rateLimiter = False
+
+# Shared by all sessions in a script so that a host that is down is noticed once
+circuitBreaker = circuit_breaker()
+
+# Response cache used by sessions started with cache = True
+if apiCacheDir:
+	apiCache = api_cache(apiCacheDir, apiCacheTtl, apiCacheMaxBytes)
+else:
+	apiCache = False
+
+# Barcode to IDs lookup table used by lookup_barcodes
+if apiCacheDir:
+	barcodeCache = barcode_cache(apiCacheDir)
+else:
+	barcodeCache = False
+
+# Local mirror of our published exports, used by lookups made with mirror = True
+if almaMirrorFile:
+	almaMirror = alma_mirror(almaMirrorFile)
+else:
+	almaMirror = False
+
+# Barcode lookups in progress, by barcode, so that concurrent lookups
+# of the same barcode are sent to Alma only once
+barcodesInFlight     = {}
+barcodesInFlightLock = threading.Lock()
+
+# API calls made, by API key, in this script
+apiQuotas     = {}
+apiQuotasLock = threading.Lock()
+
+# Get the api_quota for an API key
+def get_api_quota(apiKey):
+	with apiQuotasLock:
+		if apiKey not in apiQuotas:
+			apiQuotas[apiKey] = api_quota()
+		return apiQuotas[apiKey]
+
+# Use this class to track API calls made with an API key and the
+# calls remaining for the day as reported by Alma
+class api_quota:
+
+	def __init__(self):
+		self.calls     = 0
+		self.remaining = None
+		self.lock      = threading.Lock()
+
+	def record(self, headers):
+		with self.lock:
+			self.calls += 1
+			remaining = headers.get('X-Remaining-API-Calls')
+			if remaining and remaining.isdigit():
+				self.remaining = int(remaining)
+
+# Use this class to hold a session for each API area's key. Bulk jobs can 
+# spread their requests over several keys by setting a list of keys for an
+# area. The session with the most calls remaining for the day is used.
+#
+# Example:
+#	pool = api_session_pool('xml', {'bibs': [apiKeyBibsRw, apiKeyBibsRw2]})
+#	almaSession = pool.session('bibs')
+#	almaSession.get_bib(mmsId)
+#
+class api_session_pool:
+
+	# Parameters
+	#   sessionType   json or xml
+	#   keys          Optional, API keys by area. A key or list of keys per area.
+	#                 Areas not set use the keys from main.yaml.
+	#   cache         As with api_session
+	def __init__(self, sessionType, keys = False, cache = False):
+		self.sessionType = sessionType
+		self.sessions    = {}
+
+		areaKeys = dict(apiKeys)
+		if keys:
+			areaKeys.update(keys)
+
+		for area, keyList in areaKeys.items():
+			if not isinstance(keyList, (list, tuple)):
+				keyList = [keyList]
+
+			self.sessions[area] = []
+			for apiKey in keyList:
+				if apiKey:
+					session = api_session(sessionType, apiKey, cache)
+					session.apiKeys[area] = apiKey
+					self.sessions[area].append(session)
+
+	# Get the session to use for an area. Returns False if the area has no key.
+	def session(self, area):
+		sessions = self.sessions.get(area)
+		if not sessions:
+			return False
+
+		# Keys that Alma hasn't reported on yet are used first,
+		# then the key that has made the fewest calls
+		def remaining(session):
+			quota = get_api_quota(session.apiKeys[area])
+			if quota.remaining is None:
+				return (float('inf'), -quota.calls)
+			return (quota.remaining, -quota.calls)
+
+		return max(sessions, key = remaining)
+
+	# Returns API calls made and remaining for each area's keys.
+	# Keys are identified by their last 4 characters.
+	def quota(self):
+		quotas = {}
+		for area, sessions in self.sessions.items():
+			quotas[area] = []
+			for session in sessions:
+				apiKey = session.apiKeys[area]
+				quota  = get_api_quota(apiKey)
+				quotas[area].append({'key': f'...{apiKey[-4:]}', 'calls': quota.calls, 'remaining': quota.remaining})
+
+		return quotas
+
+	# Close all sessions
+	def close(self):
+		for sessions in self.sessions.values():
+			for session in sessions:
+				session.close()
 
 class api_session(Session):
 
-	def __init__(self, sessionType, apiKey = False):
+	# Set cache to True to use the response cache configured in main.yaml
+	# or pass an api_cache instance to use that instead
+	def __init__(self, sessionType, apiKey = False, cache = False):
 
 		if sessionType == 'json' or sessionType == 'xml':
 			super().__init__()
 			self.sessionType    = sessionType
 			self.apiKey         = apiKey
+			self.apiKeys        = dict(apiKeys)
 			self.startSession()
 			self.connectTimeOut = 5
 			self.readTimeOut    = 60
 			self.maxTries       = 3
 			self.urlRequest     = False 
+			self.poolSize       = 10
+			self.rateLimiter    = rateLimiter
+			self.retryPolicy    = retry_policy()
+			self.circuitBreaker = circuitBreaker
+			self.cacheHit       = False
+			self.mirrorHit      = False
+			self.requestHooks   = []
+			if cache is True:
+				self.cache = apiCache
+			else:
+				self.cache = cache
 		else:
 			self.msgFail = 'Session type %s is not supported' % sessionType
 			return None
@@ -38,6 +228,10 @@ class api_session(Session):
 			           'Content-type': 'application/xml',
 			           'accept': 'application/xml'
 			           }
+
+		# Large listings are several times smaller compressed. Streamed
+		# responses are decompressed as they are read.
+		headers['Accept-Encoding'] = 'gzip, deflate'
 	
 		self.headers.update(headers)
 		self.sessionAlive = True
@@ -47,107 +241,1080 @@ class api_session(Session):
 			
 		return self
 
-	# Start Http session
+	# Use the API key for an API area (bibs, users, acquisitions, analytics,
+	# requests or jobs). The authorization header is updated if the key changes.
+	def use_api_key(self, area):
+		apiKey = self.apiKeys.get(area)
+
+		if apiKey and apiKey != self.apiKey:
+			self.apiKey = apiKey
+			self.headers.update({'authorization': 'apikey {}'.format(self.apiKey)})
+
+		return self
+
+	# Stop Http session. Pooled connections are left alone, urllib3 already
+	# discards a broken one and worker sessions share their parent's adapters.
 	def stopSession(self):	
-		self.headers.update({'Connection':'close'})
+		self.sessionAlive = False
 		return self
 
 	# Make Alma's API request. Multiple attempts will be made if needed.
-	def api_request(self, method, url, data = False):
-		self.attempts = 1
-		self.text     = False
+	# Whether, and how long to wait before, another attempt is made is 
+	# decided by self.retryPolicy. Requests to a host that keeps failing
+	# are stopped by self.circuitBreaker.
+	#
+	# Set cache to True to use the session's response cache, if it has one,
+	# for a get request.
+	#
+	# Set stream to True to leave the body of a successful response unread.
+	# The response is then found in self.response and self.text is not set.
+	def api_request(self, method, url, data = False, cache = False, stream = False):
+		self.attempts   = 1
+		self.text       = False
+		self.response   = False
+		self.statusCode = False
+		self.error      = False
+		self.cacheHit   = False
+		self.mirrorHit  = False
+		self.responseHeaders = False
+		host    = urlparse(url).netloc
+		headers = {}
+		cached  = False
+
+		if method not in ('get', 'post', 'put', 'delete'):
+			self.error = 'Http method %s is not supported' % method
+			return None
+
+		# Use a cached response if it's still fresh, otherwise ask Alma if it has changed
+		if cache and self.cache and method == 'get':
+			cacheScope = self.cache.make_scope(self.headers.get('authorization'), self.sessionType)
+			cached     = self.cache.get(url, cacheScope)
+			if cached:
+				if cached['fresh']:
+					self.statusCode = 200
+					self.text       = cached['body']
+					self.cacheHit   = True
+					return None
+				if cached['etag']:
+					headers['If-None-Match'] = cached['etag']
+				if cached['lastModified']:
+					headers['If-Modified-Since'] = cached['lastModified']
+		else:
+			cache = False
+
+		# Send text as utf-8, requests would otherwise encode it as latin-1
+		if isinstance(data, str):
+			data = data.encode('utf-8')
 
 		for loopCount in range(1, (self.maxTries + 1)):
-			try:
-				if method == 'post':
-					if data:
-						response = self.post(url, data = data, timeout = (self.connectTimeOut, self.readTimeOut))
-					else:
-						response = self.post(url, timeout = (self.connectTimeOut, self.readTimeOut))
-						
-				elif method == 'put':
-					if data:
-						response = self.put(url, data = data, timeout = (self.connectTimeOut, self.readTimeOut))
-					else:
-						response = self.put(url, timeout = (self.connectTimeOut, self.readTimeOut))
-						
-				elif method == 'get':
-					response = self.get(url, timeout = (self.connectTimeOut, self.readTimeOut))
+			response = False
 
-				elif method == 'delete':
-					response = self.delete(url, timeout = (self.connectTimeOut, self.readTimeOut))
+			if self.circuitBreaker and not self.circuitBreaker.allow(host):
+				self.statusCode = False
+				self.error = f'Requests to {host} have been stopped after repeated failures'
+				break
 
+			# Carry on without rate limiting if the shared state file can't be used
+			if self.rateLimiter:
+				try:
+					self.rateLimiter.acquire()
+				except OSError as e:
+					print(f'Rate limiting is off for this session, {self.rateLimiter.stateFile} could not be used: {e}')
+					self.rateLimiter = False
+
+			requestStart = time()
+			try:
+				if data:
+					response = self.request(method, url, data = data, headers = headers, timeout = (self.connectTimeOut, self.readTimeOut), stream = stream)
 				else:
-					self.error = 'Http method %s is not supported' % method
-					return None
+					response = self.request(method, url, headers = headers, timeout = (self.connectTimeOut, self.readTimeOut), stream = stream)
 						
-				self.statusCode = response.status_code
-				self.text       = response.text
+				self.statusCode      = response.status_code
+				self.responseHeaders = response.headers
+				get_api_quota(self.apiKey).record(response.headers)
+				if stream and self.statusCode >= 200 and self.statusCode < 300:
+					self.response = response
+				else:
+					self.text = response.text
+
+				# Our cached response is still current
+				if self.statusCode == 304 and cached:
+					self.statusCode = 200
+					self.text       = cached['body']
+					self.cacheHit   = True
+					self.cache.refresh(url, cacheScope)
 	
-				if self.statusCode == 200:
+				elif cache and self.statusCode == 200:
+					self.cache.put(url, cacheScope, self.text, response.headers.get('ETag'), response.headers.get('Last-Modified'))
+
+				if self.statusCode >= 200 and self.statusCode < 300:
 					self.error = False
+					if self.circuitBreaker:
+						self.circuitBreaker.record(host, True)
+					self.run_hooks(method, url, response, time() - requestStart)
 					break
+
 				# Try to capture errors
 				else:
-					returnedMsg = response.text.replace('\n', ' ')
-					match = re.match('.*<errorMessage>(.+)</errorMessage>.*', returnedMsg)
-					if match == None:
-						match = re.match('.*"errorMessage":"(.+)",.*', returnedMsg)
-						if match == None:
-							self.error = response.text
-						else:
-							self.error = match.group(1)
-					else:
-						self.error = match.group(1)
+					self.error = parse_error(response.content) or response.text
+
+					# Over Alma's per second threshold. Hold back all of our requests.
+					if self.statusCode == 429 or 'PER_SECOND_THRESHOLD' in response.text:
+						if self.rateLimiter:
+							self.rateLimiter.drain()
 			
 			except Exception as e:
-				self.error = e
+				self.statusCode = False
+				self.error      = e
 
-			# If API calls fails, restart session, increment attempts, and then wait
-			self.stopSession()
-			sleep((loopCount * 10))
+			self.run_hooks(method, url, response, time() - requestStart)
+
+			# Only server side problems count towards stopping requests to the host
+			if self.circuitBreaker:
+				self.circuitBreaker.record(host, (self.statusCode and self.statusCode < 500))
+
+			if loopCount == self.maxTries:
+				break
+
+			if response is not False:
+				wait = self.retryPolicy.retry_wait(loopCount, self.statusCode, response.text, response.headers)
+			else:
+				wait = self.retryPolicy.retry_wait(loopCount, False)
+			if wait is False:
+				break
+
+			# Start over with a fresh connection if the last one failed
+			if response is False:
+				self.stopSession()
+			sleep(wait)
 			self.startSession()
 			self.attempts += 1
 				
-	# Get Bib record
-	def get_bib(self, mmsId):
-		self.apiKey = apiKeyBibsRw
+	# Add a hook to be called after every request attempt. Hooks are called as
+	# hook(session, method, url, response, elapsed) where response is False if
+	# no response was received, elapsed is in seconds and the attempt number and
+	# any error are found in session.attempts and session.error.
+	def add_hook(self, hook):
+		self.requestHooks.append(hook)
+		return self
+
+	# A failing hook should never fail the request
+	def run_hooks(self, method, url, response, elapsed):
+		for hook in self.requestHooks:
+			try:
+				hook(self, method, url, response, elapsed)
+			except Exception:
+				pass
+
+	# Get Bib record. Set useCache to False to skip the response cache.
+	#
+	# Set mirror to True to look in the local mirror first, or pass an
+	# alma_mirror to use instead of the one configured in main.yaml. A bib
+	# found there has only its mms_id and MARC record and self.mirrorHit
+	# is set to True.
+	def get_bib(self, mmsId, useCache = True, mirror = False):
+		if mirror:
+			if mirror is True:
+				mirror = almaMirror
+			record = mirror.get_bib(mmsId) if mirror else False
+			if record:
+				self.mirror_response(record = record, mmsId = mmsId)
+				return
+
+		self.use_api_key('bibs')
 		self.urlRequest = f'{urlBibsApi}{mmsId}'
-		self.api_request('get', self.urlRequest)
+		self.api_request('get', self.urlRequest, cache = useCache)
 		
+	# Get up to 100 Bib records with a single request. The records
+	# are returned in a <bibs> collection (or a "bib" list for json)
+	def get_bib_list(self, mmsIds):
+		self.use_api_key('bibs')
+		self.urlRequest = urlBibsApi.rstrip('/') + '?mms_id=' + ','.join(mmsIds)
+		self.api_request('get', self.urlRequest)
+
+	# Split a <bibs> collection (or json "bib" list) returned by
+	# get_bib_list into a dictionary of Bib records keyed by MMS ID
+	def split_bib_list(self, text):
+		bibs = {}
+
+		if self.sessionType == 'json':
+			for bib in api_json.loads(text).get('bib', []):
+				bibs[bib['mms_id']] = api_json.dumps(bib)
+		else:
+			root = etree.fromstring(text.encode('utf-8'))
+			for bib in root.iter('bib'):
+				mmsId = bib.findtext('mms_id')
+				if mmsId:
+					bibs[mmsId] = etree.tostring(bib, encoding = 'unicode')
+
+		return bibs
+
 	# Update Bib record
 	def update_bib(self, mmsId, data):
-		self.apiKey = apiKeyBibsRw
+		self.use_api_key('bibs')
 		self.urlRequest = f'{urlBibsApi}{mmsId}'
 		self.api_request('put', self.urlRequest, data)
+		if self.cache:
+			self.cache.invalidate(self.urlRequest)
 	
-	# Get holdings record
-	def get_holdings(self, mmsId, holdingsId):
-		self.apiKey = apiKeyBibsRw
+	# Get holdings record. Set useCache to False to skip the response cache.
+	def get_holdings(self, mmsId, holdingsId, useCache = True):
+		self.use_api_key('bibs')
 		self.urlRequest = f'{urlAlmaApi}bibs/{mmsId}/holdings/{holdingsId}'
-		self.api_request('get', self.urlRequest)
+		self.api_request('get', self.urlRequest, cache = useCache)
 		
 	# Update holdings record
 	def update_holdings(self, mmsId, holdingsId, data):
-		self.apiKey = apiKeyBibsRw
+		self.use_api_key('bibs')
 		self.urlRequest = f'{urlAlmaApi}bibs/{mmsId}/holdings/{holdingsId}'
 		self.api_request('put', self.urlRequest, data)
+		if self.cache:
+			self.cache.invalidate(self.urlRequest)
 	
 	# Get holdings, bib and item by Barcode Item
-	def lookup_by_barcode(self, barcode):
-		self.apiKey = apiKeyBibsRw
+	#
+	# Set mirror to True to look in the local mirror first, or pass an 
+	# alma_mirror. An item found there has only its IDs, barcode, library
+	# and location and self.mirrorHit is set to True.
+	def lookup_by_barcode(self, barcode, mirror = False):
+		if mirror:
+			if mirror is True:
+				mirror = almaMirror
+			ids = mirror.lookup_barcode(barcode) if mirror else False
+			if ids:
+				self.mirror_response(item = ids, barcode = barcode)
+				return
+
+		self.use_api_key('bibs')
 		self.urlRequest = f'{urlBarcodeApi}{barcode}'
-		self.api_request('get', self.urlRequest)
+		self.api_request('get', self.urlRequest, cache = True)
 				
+	# Set up a response from the local mirror as if it came from Alma: a bib
+	# with its MARC record, or an item from (mmsId, holdingId, itemPid, library, location)
+	def mirror_response(self, record = False, mmsId = False, item = False, barcode = False):
+		self.attempts   = 0
+		self.response   = False
+		self.statusCode = 200
+		self.error      = False
+		self.cacheHit   = False
+		self.mirrorHit  = True
+		self.responseHeaders = False
+
+		if record:
+			if self.sessionType == 'json':
+				self.text = api_json.dumps({'mms_id': mmsId, 'anies': [record]})
+			else:
+				self.text = f'<bib><mms_id>{mmsId}</mms_id>{record}</bib>'
+		else:
+			(mmsId, holdingId, itemPid, library, location) = item
+			if self.sessionType == 'json':
+				self.text = api_json.dumps({
+				                            'bib_data':     {'mms_id': mmsId},
+				                            'holding_data': {'holding_id': holdingId},
+				                            'item_data':    {'pid': itemPid, 'barcode': barcode, 'library': {'value': library}, 'location': {'value': location}}
+				                            })
+			else:
+				itemXml = etree.Element('item')
+				etree.SubElement(etree.SubElement(itemXml, 'bib_data'), 'mms_id').text = mmsId
+				etree.SubElement(etree.SubElement(itemXml, 'holding_data'), 'holding_id').text = holdingId
+				itemData = etree.SubElement(itemXml, 'item_data')
+				for (name, value) in (('pid', itemPid), ('barcode', barcode), ('library', library), ('location', location)):
+					etree.SubElement(itemData, name).text = value
+				self.text = etree.tostring(itemXml, encoding = 'unicode')
+
+	# Resolve many barcodes to their (mmsId, holdingId, itemPid). Barcodes are
+	# deduplicated, looked up in the barcode cache (and the local mirror if 
+	# mirror is set as with lookup_by_barcode) first and then the rest are
+	# looked up in Alma concurrently. A barcode already being looked up by 
+	# another thread is waited on rather than requested again.
+	#
+	# Set cache to False to skip the barcode cache or pass a barcode_cache 
+	# instance to use instead of the one configured in main.yaml.
+	#
+	# Returns a dictionary of barcode: (mmsId, holdingId, itemPid) and a list
+	# of (barcode, error) for barcodes that were not found or failed
+	def lookup_barcodes(self, barcodes, concurrency = 4, cache = True, mirror = False):
+		found   = {}
+		missing = []
+
+		if cache is True:
+			cache = barcodeCache
+
+		barcodes = list(dict.fromkeys(barcode.strip() for barcode in barcodes if barcode and barcode.strip()))
+		if cache:
+			found = cache.get_many(barcodes)
+
+		if mirror is True:
+			mirror = almaMirror
+		if mirror:
+			found.update(mirror.lookup_barcodes([barcode for barcode in barcodes if barcode not in found]))
+
+		def lookup_barcode(session, barcode):
+			with barcodesInFlightLock:
+				inFlight = barcodesInFlight.get(barcode)
+				if not inFlight:
+					inFlight = Future()
+					barcodesInFlight[barcode] = inFlight
+					owner = True
+				else:
+					owner = False
+
+			if not owner:
+				return (barcode,) + inFlight.result()
+
+			try:
+				session.lookup_by_barcode(barcode)
+				if session.error:
+					result = (session.statusCode, False, session.error)
+				else:
+					result = (session.statusCode, session.parse_item_ids(session.text), False)
+			except Exception as e:
+				result = (False, False, e)
+			finally:
+				with barcodesInFlightLock:
+					barcodesInFlight.pop(barcode, None)
+
+			inFlight.set_result(result)
+			return (barcode,) + result
+
+		newlyFound = {}
+		toLookup   = [barcode for barcode in barcodes if barcode not in found]
+		for (barcode, statusCode, ids, error) in self.run_batch(lookup_barcode, toLookup, concurrency):
+			if ids:
+				newlyFound[barcode] = ids
+			else:
+				missing.append((barcode, error))
+
+		if cache and newlyFound:
+			cache.put_many(newlyFound)
+		found.update(newlyFound)
+
+		return (found, missing)
+
+	# Get the (mmsId, holdingId, itemPid) from an item record
+	def parse_item_ids(self, text):
+		if self.sessionType == 'json':
+			item = api_json.loads(text)
+			return (item['bib_data']['mms_id'], item['holding_data']['holding_id'], item['item_data']['pid'])
+		else:
+			item = etree.fromstring(text.encode('utf-8'))
+			return (item.findtext('bib_data/mms_id'), item.findtext('holding_data/holding_id'), item.findtext('item_data/pid'))
+
 	# Get Item record. Get as xml.
 	def get_item(self, mmsId, holdingId, itemPid):
-		self.apiKey = apiKeyBibsRw
+		self.use_api_key('bibs')
 		self.urlRequest = f'{urlBibsApi}{mmsId}/holdings/{holdingId}/items/{itemPid}'
-		self.urlRequest = f'{urlBibsApi}{mmsId}'
 		self.api_request('get', self.urlRequest)
 
+	# Get a bib's list of holdings records
+	# With stream set to True the response is left unread in self.response
+	# for parse_holdings_list to parse as it arrives.
+	def get_holdings_list(self, mmsId, stream = False):
+		self.use_api_key('bibs')
+		self.urlRequest = f'{urlBibsApi}{mmsId}/holdings'
+		self.api_request('get', self.urlRequest, stream = stream)
+
+	# Get a page of a holding's items. Use a holdingId of ALL to get
+	# the items for all of a bib's holdings. With stream set to True the 
+	# response is left unread in self.response for parse_items_list.
+	def get_items_list(self, mmsId, holdingId = 'ALL', limit = maxRecordsPerRequest, offset = 0, stream = False):
+		self.use_api_key('bibs')
+		self.urlRequest = f'{urlBibsApi}{mmsId}/holdings/{holdingId}/items?limit={limit}&offset={offset}'
+		self.api_request('get', self.urlRequest, stream = stream)
+
+	# Get a bib's holdings and all of their items with a handful of requests:
+	# one for the holdings list and one per 100 items, with the item pages
+	# after the first requested concurrently. Set getBib to False to skip
+	# getting the bib record itself.
+	#
+	# Returns a bib_tree (mmsId, bib, holdings), each holding_record holding 
+	# its list of item_records, or False on failure with the error in self.error
+	def get_bib_tree(self, mmsId, getBib = True, concurrency = 4):
+		bib = False
+		if getBib:
+			self.get_bib(mmsId)
+			if self.error:
+				return False
+			bib = self.text
+
+		self.get_holdings_list(mmsId, stream = True)
+		if self.error:
+			return False
+		holdings = {holding.holdingId: holding for holding in self.parse_holdings_list()}
+
+		# The first page tells us how many items there are
+		self.get_items_list(mmsId, 'ALL', maxRecordsPerRequest, 0, stream = True)
+		if self.error:
+			return False
+		(items, totalItems) = self.parse_items_list()
+
+		# Pages are parsed by the worker that got them
+		def get_items_page(session, offset):
+			session.get_items_list(mmsId, 'ALL', maxRecordsPerRequest, offset, stream = True)
+			if session.error:
+				return (offset, session.statusCode, False, session.error)
+			try:
+				return (offset, session.statusCode, session.parse_items_list()[0], False)
+			except Exception as e:
+				return (offset, session.statusCode, False, e)
+
+		offsets = range(maxRecordsPerRequest, totalItems, maxRecordsPerRequest)
+		for (offset, statusCode, pageItems, error) in self.run_batch(get_items_page, offsets, concurrency):
+			if error:
+				self.error = f'Failed to get items for {mmsId} at offset {offset}: {error}'
+				return False
+			items.extend(pageItems)
+
+		for item in items:
+			if item.holdingId not in holdings:
+				holdings[item.holdingId] = holding_record(item.holdingId)
+			holdings[item.holdingId].items.append(item)
+
+		self.error = False
+		return bib_tree(mmsId, bib, list(holdings.values()))
+
+	# Parse a list of holdings into holding_records. Parses the streamed
+	# response in self.response unless text is given.
+	def parse_holdings_list(self, text = False):
+		return parse_holdings(text or self.response, self.sessionType)[0]
+
+	# Parse a page of items into item_records. Parses the streamed 
+	# response in self.response unless text is given.
+	# Returns the items and the total number of items.
+	def parse_items_list(self, text = False):
+		return parse_items(text or self.response, self.sessionType)
+
+	# Get a page of the requested resources task list for a library's
+	# circulation desk. Other task list filters, e.g. {'request_type': 'HOLD'},
+	# can be passed in params. With stream set to True the response is left 
+	# unread in self.response for parse_requested_resources.
+	def get_requested_resources(self, library, circDesk, limit = maxRecordsPerRequest, offset = 0, params = False, stream = False):
+		self.use_api_key('requests')
+		self.urlRequest = f'{urlTaskListsApi}requested-resources?library={quote(library)}&circ_desk={quote(circDesk)}&limit={limit}&offset={offset}'
+		if params:
+			self.urlRequest += ''.join(f'&{name}={quote(str(value))}' for name, value in params.items())
+		self.api_request('get', self.urlRequest, stream = stream)
+
+	# Parse a page of requested resources into request_records. Parses the
+	# streamed response in self.response unless text is given.
+	# Returns the requests and the total number of requested resources.
+	def parse_requested_resources(self, text = False):
+		return parse_requested_resources(text or self.response, self.sessionType)
+
+	# List the user requests on a library's circulation desk. The first page
+	# gives the number of requested resources, the rest of the pages are 
+	# requested concurrently.
+	#
+	# Cancelling requests takes them off the list and shifts the pages, so
+	# list all of the requests before cancelling any of them, e.g.
+	#	requests = list(almaSession.list_requests('WID', 'DEFAULT_CIRC_DESK'))
+	#
+	# Yields request_records. Sets self.error if a page failed.
+	def list_requests(self, library, circDesk, params = False, concurrency = 4):
+		self.get_requested_resources(library, circDesk, params = params, stream = True)
+		if self.error:
+			return
+		(requests, total) = self.parse_requested_resources()
+		yield from requests
+
+		def get_page(session, offset):
+			session.get_requested_resources(library, circDesk, offset = offset, params = params, stream = True)
+			if session.error:
+				return (offset, session.statusCode, False, session.error)
+			return (offset, session.statusCode, session.parse_requested_resources()[0], False)
+
+		offsets = range(maxRecordsPerRequest, total, maxRecordsPerRequest)
+		for (offset, statusCode, requests, error) in self.run_batch(get_page, offsets, concurrency):
+			if error:
+				self.error = f'Failed to get requested resources for {library} {circDesk} at offset {offset}: {error}'
+				continue
+			yield from requests
+
+	# Get a user request
+	def get_request(self, userId, requestId):
+		self.use_api_key('requests')
+		self.urlRequest = f'{urlPatronApi}/{quote(userId, safe = "")}/requests/{requestId}'
+		self.api_request('get', self.urlRequest)
+
+	# Update a user request
+	def update_request(self, userId, requestId, data):
+		self.use_api_key('requests')
+		self.urlRequest = f'{urlPatronApi}/{quote(userId, safe = "")}/requests/{requestId}'
+		self.api_request('put', self.urlRequest, data)
+
+	# Cancel a user request. Reason is one of Alma's RequestCancellationReasons codes.
+	def cancel_request(self, userId, requestId, reason = 'CannotBeFulfilled', note = False, notifyUser = False):
+		self.use_api_key('requests')
+		self.urlRequest = f'{urlPatronApi}/{quote(userId, safe = "")}/requests/{requestId}?reason={quote(reason)}&notify_user={str(notifyUser).lower()}'
+		if note:
+			self.urlRequest += f'&note={quote(note)}'
+		self.api_request('delete', self.urlRequest)
+
+	# Cancel user requests concurrently. Requests are request_records from
+	# list_requests or (userId, requestId) tuples. Each cancellation is
+	# written to journalFile so a cleanup that stops partway can be run
+	# again without cancelling the same requests twice.
+	#
+	# If notifyJM is given, failures and the API latency summary are added
+	# to its report.
+	#
+	# Returns a dictionary with counts of requests cancelled, failed and
+	# already done by an earlier run
+	def cancel_requests(self, requests, journalFile, reason = 'CannotBeFulfilled', note = False, notifyUser = False, concurrency = 4, notifyJM = False):
+
+		def cancel(session, request):
+			(userId, requestId) = self.request_ids(request)
+			session.cancel_request(userId, requestId, reason, note, notifyUser)
+			if session.error:
+				return (request, 'failed', False, session.error)
+			return (request, 'cancelled', False, False)
+
+		return self.run_request_batch(cancel, requests, journalFile, concurrency, notifyJM, 'cancel')
+
+	# Update user requests concurrently. Each request is fetched and passed,
+	# as text, to transform which returns the updated request or False or 
+	# None to skip it. Journaled as with cancel_requests.
+	#
+	# Returns a dictionary with counts of requests updated, unchanged,
+	# skipped, failed and already done by an earlier run
+	def update_requests(self, requests, transform, journalFile, concurrency = 4, notifyJM = False):
+
+		def update(session, request):
+			(userId, requestId) = self.request_ids(request)
+			session.get_request(userId, requestId)
+			if session.error:
+				return (request, 'failed', False, session.error)
+
+			original = session.text
+			updated  = transform(original)
+			if updated is None or updated is False:
+				return (request, 'skipped', False, False)
+			if updated == original:
+				return (request, 'unchanged', False, False)
+
+			session.update_request(userId, requestId, updated)
+			if session.error:
+				return (request, 'failed', False, session.error)
+			return (request, 'updated', False, False)
+
+		return self.run_request_batch(update, requests, journalFile, concurrency, notifyJM, 'update')
+
+	# Get the (userId, requestId) of a request_record or tuple
+	def request_ids(self, request):
+		if isinstance(request, tuple):
+			return request
+		return (request.userId, request.requestId)
+
+	# Run a journaled batch of user request changes for cancel_requests
+	# and update_requests
+	def run_request_batch(self, task, requests, journalFile, concurrency, notifyJM, action):
+		counts  = {'cancelled': 0, 'updated': 0, 'unchanged': 0, 'skipped': 0, 'failed': 0, 'done': 0}
+		metrics = api_metrics()
+		self.add_hook(metrics)
+
+		def request_id(request):
+			return self.request_ids(request)[1]
+
+		def describe(request, error):
+			(userId, requestId) = self.request_ids(request)
+			return f'Failed to {action} request {requestId} for {userId}: {error}'
+
+		try:
+			self.run_journaled(task, requests, journalFile, counts, request_id, describe, concurrency, notifyJM)
+		finally:
+			self.requestHooks.remove(metrics)
+
+		if notifyJM:
+			done = ', '.join(f'{count} {status}' for status, count in counts.items() if count)
+			notifyJM.log('fail' if counts['failed'] else 'pass', f'User requests {action}: {done or "no requests"}')
+			metrics.attach(notifyJM)
+
+		return counts
+
 	# Start Alma job
-	def start_job(self, jobId):
-		jobPayload = "<?xml version='1.0' encoding='utf-8'?>\n<job/>"
+	# Optionally pass a dictionary of job parameters (name: value).
+	# The link to the job instance is kept in self.jobInstanceUrl.
+	def start_job(self, jobId, params = False):
+		self.jobInstanceUrl = False
+
+		if self.sessionType == 'json':
+			job = {}
+			if params:
+				job['parameter'] = [{'name': {'value': name}, 'value': value} for name, value in params.items()]
+			jobPayload = api_json.dumps(job)
+		else:
+			job = etree.Element('job')
+			if params:
+				parameters = etree.SubElement(job, 'parameters')
+				for name, value in params.items():
+					parameter = etree.SubElement(parameters, 'parameter')
+					etree.SubElement(parameter, 'name').text  = name
+					etree.SubElement(parameter, 'value').text = str(value)
+			jobPayload = etree.tostring(job, xml_declaration = True, encoding = 'utf-8')
+
+		self.use_api_key('jobs')
 		urlRequest = urlJobsApi.format(job_id = jobId)
 		self.api_request('post', urlRequest, data = jobPayload)
+
+		# Find the link to the job instance that was started
+		if not self.error:
+			try:
+				if self.sessionType == 'json':
+					self.jobInstanceUrl = api_json.loads(self.text)['additional_info']['link']
+				else:
+					self.jobInstanceUrl = etree.fromstring(self.text.encode('utf-8')).find('additional_info').get('link')
+			except Exception:
+				self.error = f'Job {jobId} was started but its instance link was not found'
+
+	# Get a job instance's status, progress and counters.
+	# Returns a dictionary with status, progress and counters.
+	def get_job_instance(self, instanceUrl):
+		jobInstance = {'status': False, 'progress': False, 'counters': {}}
+
+		self.use_api_key('jobs')
+		self.api_request('get', instanceUrl)
+		if self.error:
+			return jobInstance
+
+		try:
+			if self.sessionType == 'json':
+				instance = api_json.loads(self.text)
+				jobInstance['status']   = instance['status']['value']
+				jobInstance['progress'] = instance.get('progress')
+				for counter in instance.get('counter', []):
+					jobInstance['counters'][counter['type']['value']] = counter['value']
+			else:
+				instance = etree.fromstring(self.text.encode('utf-8'))
+				jobInstance['status']   = instance.findtext('status')
+				jobInstance['progress'] = instance.findtext('progress')
+				for counter in instance.iter('counter'):
+					jobInstance['counters'][counter.findtext('type')] = counter.findtext('value')
+		except Exception as e:
+			self.error = f'Failed to read job instance {instanceUrl}: {e}'
+
+		return jobInstance
+
+	# Start an Alma job and, if wait is True, poll the job instance
+	# until it finishes or timeout seconds have passed.
+	#
+	# Returns a dictionary with the job's jobId, instanceUrl, status, 
+	# progress, counters and error (False unless something went wrong)
+	def run_job(self, jobId, params = False, wait = True, timeout = 86400):
+		return self.run_jobs([(jobId, params)], wait, timeout)[0]
+
+	# Start several Alma jobs and then monitor all of them with a single
+	# polling loop. Jobs is a list of job IDs or (jobId, params) tuples.
+	# Polling starts every pollWait seconds and backs off to maxPollWait.
+	# A job is no longer polled after a client error (4xx other than 429) or after
+	# maxPollFailures failed polls in a row, its error is left in the result.
+	#
+	# Returns a list of dictionaries as with run_job, in the order of jobs
+	def run_jobs(self, jobs, wait = True, timeout = 86400, pollWait = 5, maxPollWait = 300):
+		results = []
+
+		for job in jobs:
+			if isinstance(job, tuple):
+				(jobId, params) = job
+			else:
+				(jobId, params) = (job, False)
+
+			self.start_job(jobId, params)
+			results.append({
+			                'jobId':       jobId,
+			                'instanceUrl': self.jobInstanceUrl,
+			                'status':      'FAILED' if self.error else 'QUEUED',
+			                'progress':    False,
+			                'counters':    {},
+			                'error':       self.error
+			                })
+
+		if not wait:
+			return results
+
+		startTime = time()
+		failures  = [0] * len(results)
+		while True:
+			running = [index for (index, result) in enumerate(results)
+			           if result['instanceUrl'] and result['status'] not in jobEndStatuses and failures[index] < maxPollFailures]
+			if not running:
+				break
+
+			if (time() - startTime) > timeout:
+				for index in running:
+					results[index]['error'] = f"Job {results[index]['jobId']} did not finish within {timeout} seconds"
+				break
+
+			sleep(pollWait)
+			pollWait = min(pollWait * 2, maxPollWait)
+
+			for index in running:
+				result      = results[index]
+				jobInstance = self.get_job_instance(result['instanceUrl'])
+				if self.error:
+					result['error']  = self.error
+					failures[index] += 1
+					if self.statusCode and self.statusCode < 500 and self.statusCode != 429:
+						failures[index] = maxPollFailures
+				else:
+					result.update(jobInstance)
+					result['error']  = False
+					failures[index] = 0
+
+		return results
+
+	# Make sure the connection pool can hold a connection for each worker thread
+	def pool_connections(self, poolSize):
+		if poolSize > self.poolSize:
+			adapter = HTTPAdapter(pool_maxsize = poolSize)
+			self.mount('https://', adapter)
+			self.mount('http://', adapter)
+			self.poolSize = poolSize
+
+	# Get a new session for a worker thread. It shares this session's connection
+	# pool but keeps its own request state (statusCode, text, error, etc.)
+	def worker_session(self):
+		session = api_session(self.sessionType, self.apiKey, self.cache)
+		session.apiKeys        = self.apiKeys
+		session.requestHooks   = self.requestHooks
+		session.connectTimeOut = self.connectTimeOut
+		session.readTimeOut    = self.readTimeOut
+		session.maxTries       = self.maxTries
+		session.poolSize       = self.poolSize
+		session.rateLimiter    = self.rateLimiter
+		session.retryPolicy    = self.retryPolicy
+		session.circuitBreaker = self.circuitBreaker
+		for prefix, adapter in self.adapters.items():
+			session.mount(prefix, adapter)
+
+		return session
+
+	# Run task(session, item) for each item using a bounded pool of worker threads.
+	# Each worker thread gets its own worker session. Results are yielded as they
+	# complete, not in input order. A task returns a (item, statusCode, text, error)
+	# tuple. If a task raises an exception it is reported as that item's error
+	# and the rest of the batch carries on.
+	def run_batch(self, task, items, concurrency = 4):
+		self.pool_connections(concurrency)
+		workers = threading.local()
+
+		def run_task(item):
+			try:
+				session = getattr(workers, 'session', False)
+				if not session:
+					session = self.worker_session()
+					workers.session = session
+				return task(session, item)
+			except Exception as e:
+				return (item, False, False, e)
+
+		# Only keep a couple of requests queued per worker so large
+		# lists of items aren't all submitted up front
+		with ThreadPoolExecutor(max_workers = concurrency) as executor:
+			pending = set()
+			for item in items:
+				pending.add(executor.submit(run_task, item))
+				if len(pending) >= (concurrency * 2):
+					done, pending = wait_futures(pending, return_when = FIRST_COMPLETED)
+					for future in done:
+						yield future.result()
+
+			while pending:
+				done, pending = wait_futures(pending, return_when = FIRST_COMPLETED)
+				for future in done:
+					yield future.result()
+
+	# Get Bib records concurrently. Yields (mmsId, statusCode, text, error)
+	# as each request completes. Each request is retried as with get_bib.
+	def get_bibs(self, mmsIds, concurrency = 4):
+
+		def get_bib(session, mmsId):
+			session.get_bib(mmsId)
+			return (mmsId, session.statusCode, session.text, session.error)
+
+		return self.run_batch(get_bib, mmsIds, concurrency)
+
+	# Get Bib records concurrently, 100 per request. Any MMS IDs missing from
+	# a response are retrieved one at a time with get_bib. Yields
+	# (mmsId, statusCode, text, error) as each group of 100 completes.
+	def get_bibs_bulk(self, mmsIds, concurrency = 4):
+
+		def get_bib_list(session, chunk):
+			results = []
+			bibs    = {}
+
+			session.get_bib_list(chunk)
+			if session.statusCode == 200:
+				try:
+					bibs = session.split_bib_list(session.text)
+				except Exception:
+					bibs = {}
+
+			for mmsId in chunk:
+				if mmsId in bibs:
+					results.append((mmsId, 200, bibs[mmsId], False))
+				else:
+					try:
+						session.get_bib(mmsId)
+						results.append((mmsId, session.statusCode, session.text, session.error))
+					except Exception as e:
+						results.append((mmsId, False, False, e))
+
+			return results
+
+		mmsIds = iter(mmsIds)
+		chunks = iter(lambda: list(islice(mmsIds, maxBibsPerRequest)), [])
+
+		for results in self.run_batch(get_bib_list, chunks, concurrency):
+			# run_batch returns a single error tuple if the task itself failed
+			if isinstance(results, tuple):
+				(chunk, statusCode, text, error) = results
+				for mmsId in chunk:
+					yield (mmsId, statusCode, text, error)
+			else:
+				for result in results:
+					yield result
+
+	# Read, transform and update bib or holdings records with a bounded pool
+	# of worker threads. Every record's outcome is written to a journal so
+	# that if a run stops partway, running it again with the same journal 
+	# file picks up where it stopped. Records that failed are tried again.
+	#
+	# Parameters
+	#   records       MMS IDs to update bibs or (mmsId, holdingsId) tuples
+	#                 to update holdings records
+	#   transform     Called as transform(record) with the record's text and
+	#                 returns the updated record's text. Return None or False
+	#                 to leave the record as is.
+	#   journalFile   Full path to the journal file
+	#   concurrency   Worker threads
+	#   notifyJM      Optional notify object used to log failures
+	#
+	# Records that are byte-identical after transform are not sent to Alma.
+	#
+	# Returns a dictionary of counts: updated, unchanged, skipped, failed and
+	# done (finished by an earlier run)
+	def bulk_update(self, records, transform, journalFile, concurrency = 4, notifyJM = False):
+		counts = {'updated': 0, 'unchanged': 0, 'skipped': 0, 'failed': 0, 'done': 0}
+
+		def record_id(record):
+			if isinstance(record, tuple):
+				return '/'.join(record)
+			return record
+
+		def update_record(session, record):
+			# Never transform a cached copy of the record
+			if isinstance(record, tuple):
+				session.get_holdings(record[0], record[1], useCache = False)
+			else:
+				session.get_bib(record, useCache = False)
+			if session.error:
+				return (record, 'failed', False, session.error)
+
+			original = session.text
+			updated  = transform(original)
+			if updated is None or updated is False:
+				return (record, 'skipped', False, False)
+			if updated == original:
+				return (record, 'unchanged', False, False)
+
+			if isinstance(record, tuple):
+				session.update_holdings(record[0], record[1], updated)
+			else:
+				session.update_bib(record, updated)
+			if session.error:
+				return (record, 'failed', False, session.error)
+
+			return (record, 'updated', False, False)
+
+		def describe(record, error):
+			return f'Failed to update {record_id(record)}: {error}'
+
+		return self.run_journaled(update_record, records, journalFile, counts, record_id, describe, concurrency, notifyJM)
+
+	# Run task over items with run_batch, recording each item's status in a
+	# journal so a rerun skips the items already done. itemId(item) gives an
+	# item's journal key and describe(item, error) the message logged when
+	# it fails. Statuses are added to counts, with items done by an earlier
+	# run counted as done.
+	#
+	# Returns counts
+	def run_journaled(self, task, items, journalFile, counts, itemId, describe, concurrency, notifyJM):
+		journal = api_journal(journalFile)
+
+		def items_to_do():
+			for item in items:
+				if journal.is_done(itemId(item)):
+					counts['done'] += 1
+				else:
+					yield item
+
+		try:
+			for (item, status, text, error) in self.run_batch(task, items_to_do(), concurrency):
+				# run_batch reports an exception raised by the task (or transform) as a False status
+				if not status:
+					status = 'failed'
+
+				journal.record(itemId(item), status, error or '')
+				counts[status] += 1
+
+				if status == 'failed' and notifyJM:
+					notifyJM.log('fail', describe(item, error))
+		finally:
+			journal.close()
+
+		return counts
+
+	# Export Bib records to a single MARCXML collection file. Records are 
+	# fetched concurrently, 100 per request, and written as they arrive with
+	# lxml's incremental writer so memory use doesn't grow with the export.
+	# The file is gzipped if compress is True or outputFile ends with .gz.
+	#
+	# Records are written without a namespace, as in Alma's published exports,
+	# so the file can be read by parse_marc.py and make_init_scsbxml.py. Set
+	# namespace to True to put them in the MARC21 slim namespace instead.
+	#
+	# Returns a dictionary with the number of records exported and a list 
+	# of the MMS IDs that failed
+	def export_bibs(self, mmsIds, outputFile, compress = False, namespace = False, concurrency = 4, notifyJM = False):
+		results = {'exported': 0, 'failed': []}
+
+		if compress or outputFile.endswith('.gz'):
+			output = gzip.open(outputFile, 'wb')
+		else:
+			output = open(outputFile, 'wb')
+
+		if namespace:
+			nsmap  = {None: marcNs}
+			tagFmt = f'{{{marcNs}}}%s'
+		else:
+			nsmap  = None
+			tagFmt = '%s'
+
+		try:
+			with etree.xmlfile(output, encoding = 'utf-8') as xmlFile:
+				xmlFile.write_declaration()
+				with xmlFile.element(tagFmt % 'collection', nsmap = nsmap):
+					xmlFile.write('\n')
+
+					for (mmsId, statusCode, text, error) in self.get_bibs_bulk(mmsIds, concurrency):
+						try:
+							if error:
+								raise Exception(error)
+							record = self.marc_record(text)
+						except Exception as e:
+							results['failed'].append(mmsId)
+							if notifyJM:
+								notifyJM.log('fail', f'Failed to export {mmsId}: {e}')
+							continue
+
+						# Move the record into the collection's namespace, or out of any
+						if etree.QName(record).namespace != (marcNs if namespace else None):
+							for element in record.iter(etree.Element):
+								element.tag = tagFmt % etree.QName(element).localname
+							marcRecord = etree.Element(record.tag, record.attrib, nsmap = nsmap)
+							marcRecord.extend(list(record))
+							record = marcRecord
+
+						xmlFile.write(record)
+						xmlFile.write('\n')
+						results['exported'] += 1
+		finally:
+			output.close()
+
+		return results
+
+	# Get the MARC <record> element from a Bib record's text. Json Bib 
+	# records hold it as a string in their "anies" list, starting with an
+	# XML declaration for UTF-16 that lxml won't take with utf-8 bytes.
+	def marc_record(self, text):
+		if self.sessionType == 'json':
+			text = api_json.loads(text)['anies'][0].lstrip()
+			if text.startswith('<?xml'):
+				text = text[text.index('?>') + 2:]
+			record = etree.fromstring(text.encode('utf-8'))
+		else:
+			record = etree.fromstring(text.encode('utf-8')).find('record')
+
+		if record is None:
+			raise ValueError('MARC record not found in Bib record')
+
+		return record
+
+	# Stream the rows of an Alma Analytics report. Pages of limit rows are
+	# requested, following the resumption token until the report is finished.
+	# Each page is parsed as it's read and every row is yielded as a tuple of
+	# values ordered as the column headings found in self.reportColumns.
+	# Missing values are None. Requires a xml session.
+	#
+	# On failure the generator stops with the error in self.error.
+	#
+	# Example:
+	#	writer = csv.writer(output)
+	#	for rowCount, row in enumerate(almaSession.analytics_report(reportPath)):
+	#		if rowCount == 0: writer.writerow(almaSession.reportColumns)
+	#		writer.writerow(row)
+	#
+	def analytics_report(self, path, limit = 1000):
+		self.use_api_key('analytics')
+		self.reportColumns = []
+
+		if self.sessionType != 'xml':
+			self.error = 'Analytics reports require a xml session'
+			return
+
+		columnNames = []
+		token       = False
+		finished    = False
+
+		while not finished:
+			if token:
+				self.urlRequest = f'{urlAnalyticsApi}?token={quote(token)}&limit={limit}'
+			else:
+				self.urlRequest = f'{urlAnalyticsApi}?path={quote(path)}&limit={limit}&col_names=true'
+
+			self.api_request('get', self.urlRequest, stream = True)
+			if self.error:
+				return
+
+			response = self.response
+			response.raw.decode_content = True
+			rowCount = 0
+
+			try:
+				for event, element in etree.iterparse(response.raw, events = ('end',)):
+					tag = etree.QName(element).localname
+
+					if tag == 'ResumptionToken':
+						token = element.text
+					elif tag == 'IsFinished':
+						finished = (element.text == 'true')
+
+					# Column names and headings are found in the rowset's schema
+					elif tag == 'element' and element.get('name', '').startswith('Column'):
+						heading = element.get('{urn:saw-sql}columnHeading', element.get('name'))
+						if element.get('name') not in columnNames:
+							columnNames.append(element.get('name'))
+							self.reportColumns.append(heading)
+
+					elif tag == 'Row':
+						namespace = etree.QName(element).namespace
+						if namespace:
+							yield tuple(element.findtext(f'{{{namespace}}}{name}') for name in columnNames)
+						else:
+							yield tuple(element.findtext(name) for name in columnNames)
+						rowCount += 1
+
+						# Keep memory flat, drop rows once they have been yielded
+						element.clear()
+						while element.getprevious() is not None:
+							del element.getparent()[0]
+			except Exception as e:
+				self.error = e
+				return
+			finally:
+				response.close()
+
+			# Don't loop forever if Alma stops sending rows without finishing the report
+			if rowCount == 0 and not finished:
+				self.error = f'Analytics report {path} returned no rows before it finished'
+				return
@@ -0,0 +1,194 @@
+# Local SQLite mirror of the bibs, holdings and items in Alma's published
+# MARCXML exports, used to answer barcode, holdings and bib lookups without
+# going to Alma's API. Holdings come from the exports' 852 fields and items
+# from their 876 fields, tied to their holding by subfield 8.
+#
+# Example:
+#	mirror = alma_mirror(almaMirrorFile)
+#	mirror.load_file(f'{almaOutputRoot}/mirror/bibs_full.xml.gz')
+#	mirror.lookup_barcode('32044123456789')
+#
+# Initial version 10/17/26 TME
+# Last updated 10/17/26 TME
+
+import gzip, zlib
+from time import time
+from lxml import etree
+from alma_records import holding_record, item_record
+from sqlite_db import parameter_chunks, placeholders, thread_connections
+
+class alma_mirror:
+
+	# Parameters
+	#   mirrorFile   Full path to the mirror's SQLite database. Created if needed.
+	def __init__(self, mirrorFile):
+		self.mirrorFile  = mirrorFile
+		self.connections = thread_connections(mirrorFile, 60)
+
+		db = self.connections.get()
+		with db:
+			db.execute('create table if not exists bibs (mms_id text primary key, record blob, loaded real)')
+			db.execute("""create table if not exists holdings (
+			              holding_id text primary key, mms_id text, library text, location text, call_number text)""")
+			db.execute("""create table if not exists items (
+			              item_pid text primary key, barcode text, holding_id text, mms_id text)""")
+			db.execute('create index if not exists holdings_mms_id on holdings (mms_id)')
+			db.execute('create index if not exists items_barcode on items (barcode)')
+			db.execute('create index if not exists items_holding_id on items (holding_id)')
+			db.execute('create index if not exists items_mms_id on items (mms_id)')
+
+	#
+	# Loading
+	#
+
+	# Load a full or delta MARCXML export, gzipped or not. Each bib replaces
+	# what the mirror has for it, along with its holdings and items, and a bib
+	# with a leader/05 of d is removed. Records are written batchSize bibs
+	# to a transaction.
+	#
+	# Returns a dictionary with the number of bibs loaded and deleted and
+	# the number of holdings and items loaded
+	def load_file(self, inputFile, batchSize = 5000):
+		counts = {'bibs': 0, 'deleted': 0, 'holdings': 0, 'items': 0}
+		batch  = []
+
+		if inputFile.endswith('.gz'):
+			source = gzip.open(inputFile, 'rb')
+		else:
+			source = open(inputFile, 'rb')
+
+		with source:
+			for (event, record) in etree.iterparse(source, events = ('end',), tag = '{*}record', huge_tree = True):
+				parsed = self.parse_record(record)
+				if parsed:
+					batch.append(parsed)
+
+				record.clear()
+				while record.getprevious() is not None:
+					del record.getparent()[0]
+
+				if len(batch) >= batchSize:
+					self.load_batch(batch, counts)
+					batch = []
+
+		if batch:
+			self.load_batch(batch, counts)
+
+		return counts
+
+	# Get a bib's MMS ID, whether it's deleted, its holdings and items from
+	# a <record>. Holdings are (holdingId, library, location, callNumber)
+	# and items (itemPid, barcode, holdingId).
+	# Returns False for a record without an MMS ID.
+	def parse_record(self, record):
+		mmsId    = False
+		deleted  = False
+		holdings = []
+		items    = []
+
+		for field in record:
+			tag = etree.QName(field).localname
+			if tag == 'leader':
+				deleted = (field.text or '')[5:6] == 'd'
+			elif tag == 'controlfield' and field.get('tag') == '001':
+				mmsId = (field.text or '').strip()
+			elif tag == 'datafield' and field.get('tag') in ('852', '876'):
+				subfields = {}
+				for subfield in field:
+					code = subfield.get('code')
+					if code not in subfields:
+						subfields[code] = (subfield.text or '').strip()
+					elif code == 'i':
+						subfields[code] += ' ' + (subfield.text or '').strip()
+
+				if field.get('tag') == '852' and subfields.get('8'):
+					callNumber = ' '.join(part for part in (subfields.get('h'), subfields.get('i')) if part)
+					holdings.append((subfields['8'], subfields.get('b'), subfields.get('c'), callNumber or None))
+				elif field.get('tag') == '876' and subfields.get('a'):
+					items.append((subfields['a'], subfields.get('p'), subfields.get('8')))
+
+		if not mmsId:
+			return False
+
+		# Keep records as Alma's API returns them, without the MARCXML namespace
+		recordXml = None
+		if not deleted:
+			recordXml = zlib.compress(etree.tostring(record, encoding = 'utf-8').replace(b' xmlns="http://www.loc.gov/MARC21/slim"', b'', 1))
+		return (mmsId, deleted, recordXml, holdings, items)
+
+	# Write a batch of parsed records in one transaction
+	def load_batch(self, batch, counts):
+		now    = time()
+		mmsIds = [(mmsId,) for (mmsId, deleted, recordXml, holdings, items) in batch]
+
+		db = self.connections.get()
+		with db:
+			db.executemany('delete from holdings where mms_id = ?', mmsIds)
+			db.executemany('delete from items where mms_id = ?', mmsIds)
+
+			deletes = [(mmsId,) for (mmsId, deleted, recordXml, holdings, items) in batch if deleted]
+			db.executemany('delete from bibs where mms_id = ?', deletes)
+			counts['deleted'] += len(deletes)
+
+			loads = [parsed for parsed in batch if not parsed[1]]
+			db.executemany('insert or replace into bibs values (?, ?, ?)', [(mmsId, recordXml, now) for (mmsId, deleted, recordXml, holdings, items) in loads])
+			db.executemany('insert or replace into holdings values (?, ?, ?, ?, ?)',
+			               [(holding[0], mmsId, holding[1], holding[2], holding[3]) for (mmsId, deleted, recordXml, holdings, items) in loads for holding in holdings])
+			db.executemany('insert or replace into items values (?, ?, ?, ?)',
+			               [(item[0], item[1], item[2], mmsId) for (mmsId, deleted, recordXml, holdings, items) in loads for item in items])
+
+			counts['bibs']     += len(loads)
+			counts['holdings'] += sum(len(parsed[3]) for parsed in loads)
+			counts['items']    += sum(len(parsed[4]) for parsed in loads)
+
+	#
+	# Lookups
+	#
+
+	# Returns a bib's MARCXML <record> as a string, or False if it's not in the mirror
+	def get_bib(self, mmsId):
+		row = self.connections.get().execute('select record from bibs where mms_id = ?', (mmsId,)).fetchone()
+		if not row:
+			return False
+		return zlib.decompress(row[0]).decode('utf-8')
+
+	# Returns (mmsId, holdingId, itemPid, library, location) for a barcode,
+	# or False if it's not in the mirror
+	def lookup_barcode(self, barcode):
+		row = self.connections.get().execute("""select items.mms_id, items.holding_id, items.item_pid, holdings.library, holdings.location
+		                                   from items left join holdings on holdings.holding_id = items.holding_id
+		                                   where items.barcode = ?""", (barcode,)).fetchone()
+		return tuple(row) if row else False
+
+	# Returns a dictionary of barcode: (mmsId, holdingId, itemPid) for the
+	# barcodes found in the mirror
+	def lookup_barcodes(self, barcodes):
+		found    = {}
+		db       = self.connections.get()
+
+		for chunk in parameter_chunks(barcodes):
+			query = f'select barcode, mms_id, holding_id, item_pid from items where barcode in ({placeholders(chunk)})'
+			for (barcode, mmsId, holdingId, itemPid) in db.execute(query, chunk):
+				found[barcode] = (mmsId, holdingId, itemPid)
+
+		return found
+
+	# Returns a bib's holdings as holding_records, with their item_records
+	def get_holdings(self, mmsId):
+		db       = self.connections.get()
+		holdings = {}
+		for (holdingId, library, location, callNumber) in db.execute('select holding_id, library, location, call_number from holdings where mms_id = ?', (mmsId,)):
+			holdings[holdingId] = holding_record(holdingId, library, location, callNumber)
+
+		for (itemPid, barcode, holdingId) in db.execute('select item_pid, barcode, holding_id from items where mms_id = ?', (mmsId,)):
+			if holdingId not in holdings:
+				holdings[holdingId] = holding_record(holdingId)
+			holding = holdings[holdingId]
+			holding.items.append(item_record(itemPid, barcode, holdingId, holding.library, holding.location))
+
+		return list(holdings.values())
+
+	# Returns the number of bibs, holdings and items in the mirror
+	def stats(self):
+		db = self.connections.get()
+		return {table: db.execute(f'select count(*) from {table}').fetchone()[0] for table in ('bibs', 'holdings', 'items')}
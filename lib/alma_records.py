@@ -0,0 +1,262 @@
+# Compact holding, item and user request records and streaming parsers for
+# Alma's holdings, items and requested resources lists. The parsers read a
+# response body as it arrives, keeping only the fields we use instead of the
+# whole document.
+#
+# Initial version 10/17/26 TME
+# Last updated 10/17/26 TME
+
+from io import BytesIO
+from time import perf_counter
+from lxml import etree
+from api_json import loads as json_loads, record_decode
+
+# Get the value of a JSON code/description field, e.g. {"value": "MAIN", "desc": "Main Library"}
+def json_value(field):
+	if isinstance(field, dict):
+		return field.get('value')
+	return field
+
+class holding_record:
+	__slots__ = ('holdingId', 'library', 'location', 'callNumber', 'items')
+
+	def __init__(self, holdingId, library = None, location = None, callNumber = None, items = None):
+		self.holdingId  = holdingId
+		self.library    = library
+		self.location   = location
+		self.callNumber = callNumber
+		self.items      = items if items is not None else []
+
+	def __repr__(self):
+		return f'holding_record({self.holdingId!r}, {self.library!r}, {self.location!r}, {self.callNumber!r}, {len(self.items)} items)'
+
+	def as_dict(self):
+		return {field: getattr(self, field) for field in self.__slots__}
+
+	# From a <holding> element of a holdings list
+	@classmethod
+	def from_xml(cls, holding):
+		return cls(holding.findtext('holding_id'), holding.findtext('library'), holding.findtext('location'), holding.findtext('call_number'))
+
+	# From a holding in a JSON holdings list
+	@classmethod
+	def from_json(cls, holding):
+		return cls(holding.get('holding_id'), json_value(holding.get('library')), json_value(holding.get('location')), holding.get('call_number'))
+
+class item_record:
+	__slots__ = ('pid', 'barcode', 'holdingId', 'library', 'location', 'policy', 'baseStatus', 'processType')
+
+	def __init__(self, pid, barcode = None, holdingId = None, library = None, location = None, policy = None, baseStatus = None, processType = None):
+		self.pid         = pid
+		self.barcode     = barcode
+		self.holdingId   = holdingId
+		self.library     = library
+		self.location    = location
+		self.policy      = policy
+		self.baseStatus  = baseStatus
+		self.processType = processType
+
+	def __repr__(self):
+		return 'item_record(' + ', '.join(repr(getattr(self, field)) for field in self.__slots__) + ')'
+
+	def as_dict(self):
+		return {field: getattr(self, field) for field in self.__slots__}
+
+	# From an <item> element of an items list
+	@classmethod
+	def from_xml(cls, item):
+		itemData = item.find('item_data')
+		if itemData is None:
+			return cls(None, holdingId = item.findtext('holding_data/holding_id'))
+		return cls(itemData.findtext('pid'), itemData.findtext('barcode'), item.findtext('holding_data/holding_id'),
+		           itemData.findtext('library'), itemData.findtext('location'), itemData.findtext('policy'),
+		           itemData.findtext('base_status'), itemData.findtext('process_type'))
+
+	# From an item in a JSON items list
+	@classmethod
+	def from_json(cls, item):
+		itemData = item.get('item_data') or {}
+		return cls(itemData.get('pid'), itemData.get('barcode'), (item.get('holding_data') or {}).get('holding_id'),
+		           json_value(itemData.get('library')), json_value(itemData.get('location')), json_value(itemData.get('policy')),
+		           json_value(itemData.get('base_status')), json_value(itemData.get('process_type')))
+
+class request_record:
+	__slots__ = ('requestId', 'userId', 'mmsId', 'requestType', 'requestSubType', 'title', 'library', 'circDesk')
+
+	def __init__(self, requestId, userId = None, mmsId = None, requestType = None, requestSubType = None, title = None, library = None, circDesk = None):
+		self.requestId      = requestId
+		self.userId         = userId
+		self.mmsId          = mmsId
+		self.requestType    = requestType
+		self.requestSubType = requestSubType
+		self.title          = title
+		self.library        = library
+		self.circDesk       = circDesk
+
+	def __repr__(self):
+		return 'request_record(' + ', '.join(repr(getattr(self, field)) for field in self.__slots__) + ')'
+
+	def as_dict(self):
+		return {field: getattr(self, field) for field in self.__slots__}
+
+	# The requests of a <requested_resource> element of a requested resources list
+	@classmethod
+	def from_xml(cls, resource):
+		requests = []
+		mmsId    = resource.findtext('resource_metadata/mms_id')
+		title    = resource.findtext('resource_metadata/title')
+		library  = resource.findtext('location/library')
+		for request in resource.iter('request'):
+			requests.append(cls(request.findtext('id'), request.findtext('user_primary_id') or user_from_link(request.get('link')),
+			                    mmsId, request.findtext('request_type'), request.findtext('request_sub_type'), title,
+			                    library, request.findtext('destination/circulation_desk') or request.findtext('circ_desk')))
+		return requests
+
+	# The requests of a requested resource in a JSON requested resources list
+	@classmethod
+	def from_json(cls, resource):
+		requests = []
+		metadata = resource.get('resource_metadata') or {}
+		library  = json_value((resource.get('location') or {}).get('library'))
+		for request in resource.get('request') or []:
+			requests.append(cls(request.get('id'), request.get('user_primary_id') or user_from_link(request.get('link')),
+			                    json_value(metadata.get('mms_id')), json_value(request.get('request_type')),
+			                    json_value(request.get('request_sub_type')), metadata.get('title'), library,
+			                    json_value((request.get('destination') or {}).get('circulation_desk') or request.get('circ_desk'))))
+		return requests
+
+# Get the user ID from a user request's link, e.g. .../users/{userId}/requests/{requestId}
+def user_from_link(link):
+	if link and '/users/' in link:
+		return link.split('/users/')[1].split('/')[0]
+	return None
+
+# Reads a streamed response's body, decompressing it as it's read, and
+# counts the bytes read
+class body_reader:
+	__slots__ = ('raw', 'bytesRead')
+
+	def __init__(self, raw):
+		raw.decode_content = True
+		self.raw       = raw
+		self.bytesRead = 0
+
+	def read(self, size = -1):
+		data = self.raw.read(size if size and size > 0 else None)
+		self.bytesRead += len(data)
+		return data
+
+	def tell(self):
+		return self.bytesRead
+
+# Get a readable source for the parsers from a streamed requests response,
+# bytes or a string
+def body_stream(source):
+	if hasattr(source, 'raw'):
+		return body_reader(source.raw)
+	if isinstance(source, str):
+		source = source.encode('utf-8')
+	return BytesIO(source)
+
+# Read a whole body as bytes for the JSON decoder. A compressed body is
+# decompressed a chunk at a time as it's read.
+def body_bytes(source):
+	if hasattr(source, 'raw'):
+		return source.content
+	return source
+
+# Bytes received over the wire for a streamed response, after it's been read
+def wire_bytes(source):
+	try:
+		return source.raw.tell() if hasattr(source, 'raw') else 0
+	except Exception:
+		return 0
+
+# Parse a list of records, e.g. <items total_record_count="3"><item>...</item></items>,
+# one record element at a time, clearing each one once it's been mapped.
+# Returns a list of records and the list's total_record_count.
+def parse_xml_list(source, listTag, recordTag, recordClass):
+	records   = []
+	total     = 0
+	startTime = perf_counter()
+	stream    = body_stream(source)
+
+	for (event, element) in etree.iterparse(stream, events = ('start', 'end'), tag = (listTag, recordTag)):
+		if event == 'start':
+			if element.tag == listTag:
+				total = int(element.get('total_record_count', 0))
+			continue
+
+		if element.tag == recordTag:
+			record = recordClass.from_xml(element)
+			if isinstance(record, list):
+				records.extend(record)
+			else:
+				records.append(record)
+			element.clear()
+			while element.getprevious() is not None:
+				del element.getparent()[0]
+
+	# Reading a streamed body is counted as decoding it
+	record_decode('xml', stream.tell(), perf_counter() - startTime, wire_bytes(source))
+
+	return (records, total)
+
+# As with parse_xml_list for a JSON list, e.g. {"item": [...], "total_record_count": 3}
+def parse_json_list(source, recordKey, recordClass):
+	recordList = json_loads(body_bytes(source), wire_bytes(source))
+	records    = []
+	for record in recordList.get(recordKey) or []:
+		record = recordClass.from_json(record)
+		if isinstance(record, list):
+			records.extend(record)
+		else:
+			records.append(record)
+	return (records, int(recordList.get('total_record_count') or 0))
+
+# Parse a holdings list. Source is a streamed response, bytes or a string.
+# Returns a list of holding_records and the total number of holdings.
+def parse_holdings(source, sessionType):
+	if sessionType == 'json':
+		return parse_json_list(source, 'holding', holding_record)
+	return parse_xml_list(source, 'holdings', 'holding', holding_record)
+
+# Parse a page of items. Source is a streamed response, bytes or a string.
+# Returns a list of item_records and the total number of items.
+def parse_items(source, sessionType):
+	if sessionType == 'json':
+		return parse_json_list(source, 'item', item_record)
+	return parse_xml_list(source, 'items', 'item', item_record)
+
+# Parse a page of requested resources. Source is a streamed response, bytes
+# or a string. Returns a list of request_records, one per request, and the 
+# total number of requested resources.
+def parse_requested_resources(source, sessionType):
+	if sessionType == 'json':
+		return parse_json_list(source, 'requested_resource', request_record)
+	return parse_xml_list(source, 'requested_resources', 'requested_resource', request_record)
+
+# Get the error messages from an Alma error response. Only the errorList is
+# read, XML is parsed up to the end of the last errorMessage.
+# Returns the messages joined with '; ' or False if none were found.
+def parse_error(text):
+	messages = []
+	if not text:
+		return False
+
+	try:
+		if text.lstrip()[:1] in ('{', b'{'):
+			errorList = (json_loads(text).get('errorList') or {}).get('error') or []
+			if isinstance(errorList, dict):
+				errorList = [errorList]
+			messages = [error.get('errorMessage') for error in errorList if error.get('errorMessage')]
+		else:
+			for (event, element) in etree.iterparse(body_stream(text), events = ('end',), tag = ('{*}errorMessage', '{*}errorList'), recover = True):
+				if element.tag.endswith('errorList'):
+					break
+				if element.text:
+					messages.append(element.text.strip())
+	except Exception:
+		return False
+
+	return '; '.join(messages) if messages else False
@@ -0,0 +1,163 @@
+# Bulk client for Alma's Users API. Lists users with several offset pages
+# requested at once, gets full user records concurrently and writes them
+# to a JSON lines file, one user per line. An incremental export only gets
+# the users modified since the last export.
+#
+# Example:
+#	users = alma_users()
+#	counts = users.export_users(f'{dataDir}/users.jsonl', stateFile = f'{dataDir}/users_state.json')
+#
+# Initial version 10/17/26 TME
+# Last updated 10/17/26 TME
+
+import gzip, json, os
+from urllib.parse import quote
+from alma_api import api_session
+from almatools import urlPatronApi
+from api_json import loads as json_loads, dumps as json_dumps
+
+# Alma's users list returns up to 100 users per request
+maxUsersPerRequest = 100
+
+class alma_users:
+
+	# Parameters
+	#   almaSession   A json api_session to use. One is started if not given.
+	#   concurrency   Worker threads for list pages and user records
+	def __init__(self, almaSession = False, concurrency = 4):
+		if not almaSession:
+			almaSession = api_session('json')
+		self.session     = almaSession
+		self.concurrency = concurrency
+		self.failed      = []
+		self.error       = False
+
+	# Get a page of brief user records. Sorting by primary ID keeps the
+	# pages steady while they are requested.
+	# Returns (offset, statusCode, users, error), users being a list of dictionaries.
+	def get_users_page(self, session, offset, query = False, limit = maxUsersPerRequest):
+		session.use_api_key('users')
+		session.urlRequest = f'{urlPatronApi}?limit={limit}&offset={offset}&order_by=primary_id'
+		if query:
+			session.urlRequest += '&q=' + quote(query)
+
+		session.api_request('get', session.urlRequest)
+		if session.error:
+			return (offset, session.statusCode, False, session.error)
+
+		userList = json_loads(session.text)
+		return (offset, session.statusCode, userList.get('user') or [], int(userList.get('total_record_count') or 0))
+
+	# List brief user records, optionally limited by an Alma users query
+	# (e.g. 'user_group~STAFF'). The first page gives the number of users,
+	# the rest of the pages are requested concurrently.
+	#
+	# Yields users as dictionaries. Pages that failed are added to
+	# self.failed as ('offset N', error).
+	def list_users(self, query = False):
+		(offset, statusCode, users, total) = self.get_users_page(self.session, 0, query)
+		if users is False:
+			self.error = total
+			self.failed.append(('offset 0', total))
+			return
+
+		yield from users
+
+		def get_page(session, offset):
+			(offset, statusCode, users, total) = self.get_users_page(session, offset, query)
+			if users is False:
+				return (offset, statusCode, False, total)
+			return (offset, statusCode, users, False)
+
+		offsets = range(maxUsersPerRequest, total, maxUsersPerRequest)
+		for (offset, statusCode, users, error) in self.session.run_batch(get_page, offsets, self.concurrency):
+			if error:
+				self.error = error
+				self.failed.append((f'offset {offset}', error))
+				continue
+			yield from users
+
+	# Get a full user record. Check session.error, the record is in session.text.
+	def get_user(self, session, primaryId):
+		session.use_api_key('users')
+		session.urlRequest = f'{urlPatronApi}/{quote(primaryId, safe = "")}?view=full&expand=none'
+		session.api_request('get', session.urlRequest)
+
+	# Get full user records concurrently. Yields (primaryId, statusCode, text, error)
+	# as each request completes.
+	def get_users(self, primaryIds):
+		def get_user(session, primaryId):
+			self.get_user(session, primaryId)
+			return (primaryId, session.statusCode, session.text, session.error)
+
+		return self.session.run_batch(get_user, primaryIds, self.concurrency)
+
+	# Load the high-water mark of an earlier incremental export
+	def read_state(self, stateFile):
+		if stateFile and os.path.isfile(stateFile):
+			with open(stateFile) as state:
+				return json.load(state).get('lastModified', False)
+		return False
+
+	# Save the high-water mark, replacing the state file in one step
+	def write_state(self, stateFile, lastModified):
+		with open(stateFile + '.tmp', 'w') as state:
+			json.dump({'lastModified': lastModified}, state)
+		os.replace(stateFile + '.tmp', stateFile)
+
+	# Export full user records to a JSON lines file. Users are listed, and
+	# their full records requested, concurrently and written as they arrive.
+	# The file is gzipped if outputFile ends with .gz.
+	#
+	# With a stateFile only users whose last_modified_date is on or after
+	# the latest last_modified_date seen by the previous export are fetched
+	# again, and the file then holds only those users. Alma gives the date
+	# to the day, so users modified on that day are fetched again to be safe.
+	# The mark isn't moved if any user failed.
+	#
+	# Returns a dictionary with the number of users listed, exported and
+	# unchanged and a list of (primaryId or page, error) for failures
+	def export_users(self, outputFile, query = False, stateFile = False, notifyJM = False):
+		counts = {'listed': 0, 'exported': 0, 'unchanged': 0, 'failed': []}
+		self.failed = []
+		self.error  = False
+
+		highWaterMark = self.read_state(stateFile)
+		lastModified  = highWaterMark
+
+		def users_to_get():
+			nonlocal lastModified
+			for user in self.list_users(query):
+				counts['listed'] += 1
+				modified = user.get('last_modified_date')
+				if modified and (not lastModified or modified > lastModified):
+					lastModified = modified
+
+				# Users without a last_modified_date are always fetched
+				if highWaterMark and modified and modified < highWaterMark:
+					counts['unchanged'] += 1
+					continue
+
+				yield user['primary_id']
+
+		if outputFile.endswith('.gz'):
+			output = gzip.open(outputFile, 'wt', encoding = 'utf-8')
+		else:
+			output = open(outputFile, 'w', encoding = 'utf-8')
+
+		with output:
+			for (primaryId, statusCode, text, error) in self.get_users(users_to_get()):
+				if error or not text:
+					self.failed.append((primaryId, error))
+					if notifyJM:
+						notifyJM.log('fail', f'Failed to get user {primaryId}: {error}')
+					continue
+
+				output.write(json_dumps(json_loads(text)) + '\n')
+				counts['exported'] += 1
+
+		counts['failed'] = self.failed
+		if stateFile and lastModified and not self.failed:
+			self.write_state(stateFile, lastModified)
+
+		return counts
@@ -2,7 +2,7 @@
 # Loads almaconfig.yaml and makes its variables available to our Python scripts 
 #
 # Initial version 10/12/18 TME
-# Last updated 10/23/23 TME
+# Last updated 10/17/26 TME
 
 #
 # Load modules, set/initialize global variables
@@ -35,8 +35,34 @@ try:
 	urlBarcodeApi   = urlAlmaApi + 'items?item_barcode='
 	urlJobsApi      = urlAlmaApi + 'conf/jobs/{job_id}?op=run'
 	urlHoldingsApi  = urlAlmaApi + 'bibs/{mmsId}/holdings/{holdingsId}'
+	urlTaskListsApi = urlAlmaApi + 'task-lists/'
+	urlAcqApi       = urlAlmaApi + 'acq/'
 except:
 	print('Error: failed to load config parameter urlAlmaApi from %s' % scriptConf)
+try:
+	apiRateLimit = config['apiRateLimit']
+except:
+	apiRateLimit = False
+try:
+	apiRateLimitFile = config['apiRateLimitFile']
+except:
+	apiRateLimitFile = '/tmp/alma_api_rate_limit'
+try:
+	apiCacheDir = config['apiCacheDir']
+except:
+	apiCacheDir = False
+try:
+	apiCacheTtl = config['apiCacheTtl']
+except:
+	apiCacheTtl = 86400
+try:
+	apiCacheMaxBytes = config['apiCacheMaxBytes']
+except:
+	apiCacheMaxBytes = 1073741824
+try:
+	almaMirrorFile = config['almaMirrorFile']
+except:
+	almaMirrorFile = False
 try:
 	urlNcip = config['urlNcip']
 except:
@@ -86,6 +112,10 @@ try:
 	apiKeyUserRequest = config['apiKeyUserRequest']	
 except:
 	print('Error: failed to load config parameter apiKeyUserRequest from %s' % scriptConf)
+try:
+	apiKeyJobs = config['apiKeyJobs']
+except:
+	apiKeyJobs = False
 try:
 	webhookDir = config['webhookDir']	
 except:
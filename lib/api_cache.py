@@ -0,0 +1,200 @@
+# Persistent cache for Alma API GET responses. Responses are kept in a
+# SQLite database under a configurable directory, keyed by url and API key
+# scope. Expired responses with an ETag or Last-Modified header are
+# revalidated with a conditional request rather than fetched again.
+#
+# Initial version 10/17/26 TME
+# Last updated 10/17/26 TME
+
+import hashlib, os, threading
+from time import time
+from sqlite_db import parameter_chunks, placeholders, thread_connections
+
+class api_cache:
+
+	# Parameters
+	#   cacheDir   Directory to keep the cache database in
+	#   ttl        Seconds a cached response is used without checking with Alma
+	#   maxBytes   Size of cached responses, in bytes, before the least
+	#              recently used responses are removed
+	def __init__(self, cacheDir, ttl = 86400, maxBytes = 1073741824):
+		self.cacheFile   = os.path.join(cacheDir, 'api_cache.sqlite')
+		self.ttl         = ttl
+		self.maxBytes    = maxBytes
+		self.connections = thread_connections(self.cacheFile)
+		self.lock        = threading.Lock()
+
+		# Hit/miss counters
+		self.hits        = 0
+		self.misses      = 0
+		self.revalidated = 0
+		self.stores      = 0
+		self.evictions   = 0
+		self.invalidated = 0
+
+		os.makedirs(cacheDir, exist_ok = True)
+		db = self.connections.get()
+		with db:
+			db.execute("""create table if not exists responses (
+			              key text primary key, url text, body text, etag text,
+			              last_modified text, stored real, accessed real, size integer)""")
+			db.execute('create index if not exists responses_url on responses (url)')
+			db.execute('create index if not exists responses_accessed on responses (accessed)')
+
+	# Cache entries are scoped by API key (hashed) and session type
+	def make_scope(self, apiKey, sessionType):
+		return hashlib.sha256(f'{apiKey}:{sessionType}'.encode('utf-8')).hexdigest()[:16]
+
+	def make_key(self, url, scope):
+		return hashlib.sha256(f'{scope} {url}'.encode('utf-8')).hexdigest()
+
+	# Get a cached response. Returns False if url isn't cached, otherwise
+	# a dictionary with body, etag, lastModified and fresh (True if the
+	# response is still within its ttl).
+	def get(self, url, scope):
+		key = self.make_key(url, scope)
+		db  = self.connections.get()
+		row = db.execute('select body, etag, last_modified, stored from responses where key = ?', (key,)).fetchone()
+
+		if not row:
+			self.count('misses')
+			return False
+
+		with db:
+			db.execute('update responses set accessed = ? where key = ?', (time(), key))
+
+		fresh = (time() - row[3]) < self.ttl
+		if fresh:
+			self.count('hits')
+		elif not row[1] and not row[2]:
+			self.count('misses')
+			return False
+
+		return {'body': row[0], 'etag': row[1], 'lastModified': row[2], 'fresh': fresh}
+
+	# Cache a response
+	def put(self, url, scope, body, etag = None, lastModified = None):
+		now = time()
+		db  = self.connections.get()
+		with db:
+			db.execute('insert or replace into responses values (?, ?, ?, ?, ?, ?, ?, ?)',
+			           (self.make_key(url, scope), url, body, etag, lastModified, now, now, len(body)))
+		self.count('stores')
+
+		# Checking the cache's size means reading every row, don't do it on every store
+		if self.stores % 100 == 0:
+			self.evict()
+
+	# Alma said our cached response is still current (304). Restart its ttl.
+	def refresh(self, url, scope):
+		db = self.connections.get()
+		with db:
+			db.execute('update responses set stored = ?, accessed = ? where key = ?', (time(), time(), self.make_key(url, scope)))
+		self.count('revalidated')
+
+	# Remove url, and anything under it, from the cache for all scopes.
+	# For example, invalidating a bib's url also removes its holdings.
+	def invalidate(self, url):
+		db = self.connections.get()
+		with db:
+			cursor = db.execute("delete from responses where url = ? or url like ? escape '\\' or url like ? escape '\\'",
+			                    (url, self.escape_like(url) + '/%', self.escape_like(url) + '?%'))
+		self.count('invalidated', cursor.rowcount)
+
+	# Remove least recently used responses once the cache grows past maxBytes
+	def evict(self):
+		db = self.connections.get()
+		(size,) = db.execute('select coalesce(sum(size), 0) from responses').fetchone()
+		if size <= self.maxBytes:
+			return
+
+		# Make some room so that we're not evicting on every store
+		target = int(self.maxBytes * 0.9)
+		with db:
+			for (key, entrySize) in db.execute('select key, size from responses order by accessed').fetchall():
+				if size <= target:
+					break
+				db.execute('delete from responses where key = ?', (key,))
+				size -= entrySize
+				self.count('evictions')
+
+	# Counters are shared by all threads using the cache
+	def count(self, counter, amount = 1):
+		with self.lock:
+			setattr(self, counter, getattr(self, counter) + amount)
+
+	# Returns the cache's counters
+	def stats(self):
+		return {
+		        'hits':        self.hits,
+		        'misses':      self.misses,
+		        'revalidated': self.revalidated,
+		        'stores':      self.stores,
+		        'evictions':   self.evictions,
+		        'invalidated': self.invalidated
+		        }
+
+	def escape_like(self, value):
+		return value.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+# Persistent barcode to (MMS ID, holding ID, item PID) lookup table used to
+# resolve item barcodes without asking Alma every time.
+class barcode_cache:
+
+	# Parameters
+	#   cacheDir   Directory to keep the cache database in
+	#   ttl        Seconds a barcode's IDs are used before looking it up again
+	def __init__(self, cacheDir, ttl = 604800):
+		self.cacheFile   = os.path.join(cacheDir, 'barcode_cache.sqlite')
+		self.ttl         = ttl
+		self.connections = thread_connections(self.cacheFile)
+		self.lock        = threading.Lock()
+		self.hits        = 0
+		self.misses      = 0
+		self.stores      = 0
+
+		os.makedirs(cacheDir, exist_ok = True)
+		db = self.connections.get()
+		with db:
+			db.execute("""create table if not exists barcodes (
+			              barcode text primary key, mms_id text, holding_id text, item_pid text, stored real)""")
+
+	# Returns a dictionary of barcode: (mmsId, holdingId, itemPid) for the
+	# barcodes found in the cache
+	def get_many(self, barcodes):
+		found   = {}
+		oldest  = time() - self.ttl
+		db      = self.connections.get()
+		barcodes = list(barcodes)
+
+		for chunk in parameter_chunks(barcodes):
+			query = f'select barcode, mms_id, holding_id, item_pid from barcodes where stored > ? and barcode in ({placeholders(chunk)})'
+			for (barcode, mmsId, holdingId, itemPid) in db.execute(query, [oldest] + chunk):
+				found[barcode] = (mmsId, holdingId, itemPid)
+
+		with self.lock:
+			self.hits   += len(found)
+			self.misses += len(barcodes) - len(found)
+
+		return found
+
+	# Save barcodes' IDs. Pass a dictionary of barcode: (mmsId, holdingId, itemPid).
+	def put_many(self, barcodeIds):
+		now = time()
+		db  = self.connections.get()
+		with db:
+			db.executemany('insert or replace into barcodes values (?, ?, ?, ?, ?)',
+			               [(barcode, ids[0], ids[1], ids[2], now) for barcode, ids in barcodeIds.items()])
+
+		with self.lock:
+			self.stores += len(barcodeIds)
+
+	# Remove a barcode, for example after its item was deleted or moved
+	def invalidate(self, barcode):
+		db = self.connections.get()
+		with db:
+			db.execute('delete from barcodes where barcode = ?', (barcode,))
+
+	# Returns the cache's counters
+	def stats(self):
+		return {'hits': self.hits, 'misses': self.misses, 'stores': self.stores}
@@ -0,0 +1,64 @@
+# Append-only journal of records processed by a bulk job so that a job that
+# stops partway can be run again and pick up where it stopped. Each line is
+# a record ID, its status and an optional message separated by tabs.
+#
+# Initial version 10/17/26 TME
+# Last updated 10/17/26 TME
+
+import os, threading
+
+# Records with these statuses are not processed again when a job is rerun.
+# Failed records are.
+doneStatuses = ('updated', 'unchanged', 'skipped', 'cancelled')
+
+class api_journal:
+
+	# Parameters
+	#   journalFile   Full path to the journal file. Created if needed.
+	#   syncEvery     Records written between syncs to disk
+	def __init__(self, journalFile, syncEvery = 100):
+		self.journalFile = journalFile
+		self.syncEvery   = syncEvery
+		self.done        = set()
+		self.unsynced    = 0
+		self.lock        = threading.Lock()
+
+		# Load records finished by earlier runs. A later line for the same 
+		# record replaces an earlier one.
+		if os.path.isfile(journalFile):
+			with open(journalFile) as journal:
+				for line in journal:
+					fields = line.rstrip('\n').split('\t')
+					if len(fields) < 2:
+						continue
+					if fields[1] in doneStatuses:
+						self.done.add(fields[0])
+					else:
+						self.done.discard(fields[0])
+
+		self.journal = open(journalFile, 'a')
+
+	# Returns True if a record was finished by an earlier run
+	def is_done(self, recordId):
+		return str(recordId) in self.done
+
+	# Add a record's status to the journal
+	def record(self, recordId, status, message = ''):
+		message = str(message).replace('\t', ' ').replace('\n', ' ')
+
+		with self.lock:
+			self.journal.write(f'{recordId}\t{status}\t{message}\n')
+			self.journal.flush()
+			if status in doneStatuses:
+				self.done.add(str(recordId))
+
+			self.unsynced += 1
+			if self.unsynced >= self.syncEvery:
+				os.fsync(self.journal.fileno())
+				self.unsynced = 0
+
+	def close(self):
+		with self.lock:
+			self.journal.flush()
+			os.fsync(self.journal.fileno())
+			self.journal.close()
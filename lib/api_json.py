@@ -0,0 +1,79 @@
+# JSON codec for Alma API bodies. Uses the fastest installed JSON library,
+# orjson then ujson, and falls back to Python's json. Also keeps decode
+# counters (calls, bytes, seconds) so that parsing time can be measured
+# alongside api_metrics' request metrics.
+#
+# Example:
+#	from api_json import loads, dumps
+#	record = loads(session.text)
+#
+# Initial version 10/17/26 TME
+# Last updated 10/17/26 TME
+
+import json, threading
+from time import perf_counter
+
+backends = {}
+
+try:
+	import orjson
+	backends['orjson'] = (orjson.loads, lambda data: orjson.dumps(data).decode('utf-8'))
+except ImportError:
+	pass
+
+try:
+	import ujson
+	backends['ujson'] = (ujson.loads, lambda data: ujson.dumps(data, ensure_ascii = False))
+except ImportError:
+	pass
+
+backends['json'] = (json.loads, lambda data: json.dumps(data, ensure_ascii = False))
+
+# Backend in use, the first one installed in order of speed
+backend = next(name for name in ('orjson', 'ujson', 'json') if name in backends)
+(backendLoads, backendDumps) = backends[backend]
+
+# Decode counters by format (json or xml)
+decodeStats = {}
+decodeLock  = threading.Lock()
+
+# Switch JSON library. Returns False if it isn't installed.
+def use_backend(name):
+	global backend, backendLoads, backendDumps
+
+	if name not in backends:
+		return False
+
+	backend = name
+	(backendLoads, backendDumps) = backends[name]
+	return True
+
+# Add a decode to the counters. wireBytes is the size of the body as it
+# was sent, before it was decompressed, when it's known.
+def record_decode(format, bytesIn, seconds, wireBytes = 0):
+	with decodeLock:
+		stats = decodeStats.get(format)
+		if not stats:
+			stats = {'calls': 0, 'bytes': 0, 'wireBytes': 0, 'seconds': 0.0}
+			decodeStats[format] = stats
+		stats['calls']     += 1
+		stats['bytes']     += bytesIn
+		stats['wireBytes'] += wireBytes
+		stats['seconds']   += seconds
+
+# Returns a copy of the decode counters and the JSON backend in use
+def decode_stats():
+	with decodeLock:
+		return {'backend': backend, 'formats': {format: dict(stats) for format, stats in decodeStats.items()}}
+
+# Decode a JSON string or bytes. Pass wireBytes, the size of a compressed
+# body as it was received, to have it counted too.
+def loads(data, wireBytes = 0):
+	startTime = perf_counter()
+	result    = backendLoads(data)
+	record_decode('json', len(data), perf_counter() - startTime, wireBytes)
+	return result
+
+# Encode as a JSON string
+def dumps(data):
+	return backendDumps(data)
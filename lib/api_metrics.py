@@ -0,0 +1,166 @@
+# Collect Alma API request metrics: latency histograms, status codes, retries,
+# bytes transferred, compressed responses and API calls remaining, by endpoint.
+# JSON and XML decode times and sizes are taken from api_json. Add an instance to
+# an api_session as a hook and then dump or report the metrics at the end of 
+# a run.
+#
+# Example:
+#	metrics = api_metrics()
+#	almaSession.add_hook(metrics)
+#	...
+#	metrics.dump(f'{logDir}/{jobCode}_api_metrics.json')
+#	metrics.attach(notifyJM)
+#
+# Initial version 10/17/26 TME
+# Last updated 10/17/26 TME
+
+import json, re, threading
+from urllib.parse import parse_qs, urlparse
+from api_json import decode_stats
+
+# Upper bounds, in seconds, of the latency histogram buckets
+latencyBuckets = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, float('inf'))
+
+# Path segments holding IDs (MMS IDs, barcodes, user IDs, etc.) are replaced
+# with {id} so that requests are grouped by endpoint
+reIdSegment = re.compile(r'.*\d.*')
+
+class api_metrics:
+
+	def __init__(self):
+		self.endpoints = {}
+		self.remaining = None
+		self.lock      = threading.Lock()
+
+	# Called by api_session after every request attempt
+	def __call__(self, session, method, url, response, elapsed):
+		endpoint = self.endpoint(method, url)
+
+		if response is False:
+			statusCode = 'none'
+			bytesIn    = 0
+			compressed = False
+		else:
+			statusCode = str(response.status_code)
+			bytesIn    = self.response_bytes(response)
+			compressed = response.headers.get('Content-Encoding', '').lower() in ('gzip', 'deflate')
+
+		with self.lock:
+			metrics = self.endpoints.get(endpoint)
+			if not metrics:
+				metrics = {
+				           'requests':    0,
+				           'retries':     0,
+				           'seconds':     0.0,
+				           'maxSeconds':  0.0,
+				           'bytes':       0,
+				           'compressed':  0,
+				           'statusCodes': {},
+				           'histogram':   [0] * len(latencyBuckets)
+				           }
+				self.endpoints[endpoint] = metrics
+
+			metrics['requests'] += 1
+			metrics['seconds']  += elapsed
+			metrics['bytes']    += bytesIn
+			if compressed:
+				metrics['compressed'] += 1
+			metrics['maxSeconds'] = max(metrics['maxSeconds'], elapsed)
+			metrics['statusCodes'][statusCode] = metrics['statusCodes'].get(statusCode, 0) + 1
+			if session.attempts > 1:
+				metrics['retries'] += 1
+
+			for bucket, upperBound in enumerate(latencyBuckets):
+				if elapsed <= upperBound:
+					metrics['histogram'][bucket] += 1
+					break
+
+			if response is not False:
+				remaining = response.headers.get('X-Remaining-API-Calls')
+				if remaining and remaining.isdigit():
+					self.remaining = int(remaining)
+
+	# Group a request by method and its path under the API's root
+	def endpoint(self, method, url):
+		parsedUrl = urlparse(url)
+		path      = parsedUrl.path.split('/almaws/v1/')[-1]
+		segments  = ['{id}' if reIdSegment.match(segment) else segment for segment in path.strip('/').split('/')]
+		endpoint  = f"{method.upper()} {'/'.join(segments)}"
+
+		params = sorted(parse_qs(parsedUrl.query).keys())
+		if params:
+			endpoint += '?' + '&'.join(params)
+
+		return endpoint
+
+	# Bytes received over the wire. The body of a streamed response might not
+	# have been read yet, so use its Content-Length header if it has one.
+	def response_bytes(self, response):
+		try:
+			if response.raw and response.raw.tell():
+				return response.raw.tell()
+		except Exception:
+			pass
+
+		contentLength = response.headers.get('Content-Length')
+		if contentLength and contentLength.isdigit():
+			return int(contentLength)
+
+		return 0
+
+	# Estimate a latency percentile, in seconds, from an endpoint's histogram
+	def percentile(self, metrics, percent):
+		target = metrics['requests'] * percent / 100
+		count  = 0
+		for bucket, upperBound in enumerate(latencyBuckets):
+			count += metrics['histogram'][bucket]
+			if count >= target:
+				return min(upperBound, metrics['maxSeconds'])
+
+		return metrics['maxSeconds']
+
+	# Returns all metrics as a dictionary
+	def to_dict(self):
+		with self.lock:
+			endpoints = json.loads(json.dumps(self.endpoints))
+
+		for endpoint, metrics in endpoints.items():
+			metrics['histogram'] = dict(zip([str(upperBound) for upperBound in latencyBuckets], metrics['histogram']))
+			metrics['p50Seconds'] = self.percentile(self.endpoints[endpoint], 50)
+			metrics['p99Seconds'] = self.percentile(self.endpoints[endpoint], 99)
+
+		return {'remainingApiCalls': self.remaining, 'endpoints': endpoints, 'decoding': decode_stats()}
+
+	# Write metrics to a file as json
+	def dump(self, outputFile):
+		with open(outputFile, 'w') as output:
+			json.dump(self.to_dict(), output, indent = 2)
+
+	# Returns a short report, one line per endpoint, slowest endpoints first
+	def summary(self):
+		lines = ['Alma API requests']
+
+		with self.lock:
+			endpoints = sorted(self.endpoints.items(), key = lambda item: item[1]['seconds'], reverse = True)
+
+			for endpoint, metrics in endpoints:
+				average = metrics['seconds'] / metrics['requests']
+				statusCodes = ', '.join(f'{statusCode}: {count}' for statusCode, count in sorted(metrics['statusCodes'].items()))
+				lines.append(f"{endpoint}: {metrics['requests']} requests, {metrics['retries']} retries, "
+				             f"{metrics['seconds']:.1f}s total, {average:.3f}s average, "
+				             f"{metrics['bytes']} bytes, {metrics['compressed']} compressed, status codes {statusCodes}")
+
+		decoding = decode_stats()
+		for format, stats in sorted(decoding['formats'].items()):
+			backend = f" ({decoding['backend']})" if format == 'json' else ''
+			lines.append(f"Decoded {format}{backend}: {stats['calls']} bodies, {stats['bytes']} bytes "
+			             f"({stats['wireBytes']} bytes on the wire when streamed) in {stats['seconds']:.3f}s")
+
+		if self.remaining is not None:
+			lines.append(f'API calls remaining today: {self.remaining}')
+
+		return '\n'.join(lines)
+
+	# Add the summary to a notify object's report
+	def attach(self, notifyJM, type = 'pass'):
+		notifyJM.log(type, self.summary())
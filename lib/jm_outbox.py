@@ -0,0 +1,195 @@
+# Durable outbox for Job Monitor updates that couldn't be sent. Updates are
+# appended to a JSON lines spool file under the log directory, shared by
+# all jobs on the host, and replayed in order once the Job Monitor is back.
+# A marker file records that an outage is under way so that the admin is
+# mailed once per outage rather than once per job. While it's there, jobs
+# replay the outbox before sending a new update, so the Job Monitor gets
+# updates in the order they were made. notifyJM.py --replay also replays it.
+#
+# Initial version 10/17/26 TME
+# Last updated 10/17/26 TME
+
+import atexit, fcntl, json, os, threading
+from time import time
+
+class jm_outbox:
+
+	# Parameters
+	#   spoolDir    Directory to keep the spool, lock and outage marker files in
+	#   syncEvery   Updates written between syncs to disk
+	def __init__(self, spoolDir, syncEvery = 20):
+		self.spoolFile  = os.path.join(spoolDir, 'jm_outbox.jsonl')
+		self.replayFile = os.path.join(spoolDir, 'jm_outbox.replay')
+		self.lockFile   = os.path.join(spoolDir, 'jm_outbox.lock')
+		self.markerFile = os.path.join(spoolDir, 'jm_outbox.outage')
+		self.replayLock = os.path.join(spoolDir, 'jm_outbox.replaying')
+		self.syncEvery  = syncEvery
+		self.unsynced   = 0
+		self.spool      = False
+		self.lock       = threading.Lock()
+		atexit.register(self.close)
+
+	# Hold the lock file while changing the spool. Other processes wait.
+	def lock_spool(self):
+		fd = os.open(self.lockFile, os.O_RDWR | os.O_CREAT, 0o666)
+		fcntl.flock(fd, fcntl.LOCK_EX)
+		return fd
+
+	# Closing the lock file also releases the lock
+	def unlock_spool(self, fd):
+		os.close(fd)
+
+	# Append an update to the spool. The spool is synced to disk every
+	# syncEvery updates and when the script exits.
+	def add(self, jobCode, statusCode, message, runId = False):
+		event = json.dumps({'time': time(), 'jobCode': jobCode, 'statusCode': statusCode, 'runId': runId, 'message': message})
+
+		with self.lock:
+			fd = self.lock_spool()
+			try:
+				# A replay moves the spool aside, start a new one if it has
+				if self.spool and (not os.path.exists(self.spoolFile) or os.fstat(self.spool.fileno()).st_ino != os.stat(self.spoolFile).st_ino):
+					self.sync()
+					self.spool.close()
+					self.spool = False
+				if not self.spool:
+					self.spool = open(self.spoolFile, 'a')
+
+				self.spool.write(event + '\n')
+				self.spool.flush()
+				self.unsynced += 1
+				if self.unsynced >= self.syncEvery:
+					self.sync()
+			finally:
+				self.unlock_spool(fd)
+
+	def sync(self):
+		if self.spool and self.unsynced:
+			os.fsync(self.spool.fileno())
+			self.unsynced = 0
+
+	def close(self):
+		with self.lock:
+			if self.spool:
+				self.sync()
+				self.spool.close()
+				self.spool = False
+
+	# Returns the number of updates waiting in the spool
+	def pending(self):
+		count = 0
+		for spoolFile in (self.replayFile, self.spoolFile):
+			if os.path.isfile(spoolFile):
+				with open(spoolFile) as spool:
+					count += sum(1 for line in spool if line.strip())
+		return count
+
+	# Record that the Job Monitor is down. Returns True only for the call
+	# that started the outage, which should let the admin know.
+	def start_outage(self):
+		try:
+			fd = os.open(self.markerFile, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o666)
+		except FileExistsError:
+			return False
+
+		os.write(fd, f'{time()}\n'.encode())
+		os.close(fd)
+		return True
+
+	# Returns True while an outage is under way
+	def in_outage(self):
+		return os.path.exists(self.markerFile)
+
+	# Returns True if this call ended the outage
+	def end_outage(self):
+		try:
+			os.remove(self.markerFile)
+			return True
+		except FileNotFoundError:
+			return False
+
+	# Read the updates in a spool file, skipping any partly written line
+	def read_events(self, spoolFile):
+		events = []
+		if os.path.isfile(spoolFile):
+			with open(spoolFile) as spool:
+				for line in spool:
+					try:
+						events.append(json.loads(line))
+					except ValueError:
+						continue
+		return events
+
+	# Write updates to a spool file in one step
+	def write_events(self, spoolFile, events):
+		with open(spoolFile + '.tmp', 'w') as spool:
+			for event in events:
+				spool.write(json.dumps(event) + '\n')
+			spool.flush()
+			os.fsync(spool.fileno())
+		os.replace(spoolFile + '.tmp', spoolFile)
+
+	# Send spooled updates, oldest first, with send(event) returning True
+	# once an update is delivered. The spool is moved aside while it's
+	# replayed so jobs can keep adding to a new one. Progress is saved every
+	# batchSize updates. Replay stops at the first update that isn't
+	# delivered and the rest are put back ahead of any newer updates. The
+	# outage ends once the spool is empty. Only one replay runs at a time,
+	# others return at once.
+	#
+	# Returns the number of updates delivered, the number still waiting and
+	# whether this replay ended the outage
+	def replay(self, send, batchSize = 50):
+		replayFd = os.open(self.replayLock, os.O_RDWR | os.O_CREAT, 0o666)
+		try:
+			fcntl.flock(replayFd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+		except BlockingIOError:
+			os.close(replayFd)
+			return (0, self.pending(), False)
+
+		try:
+			return self.replay_spool(send, batchSize)
+		finally:
+			os.close(replayFd)
+
+	# Replay with the replay lock held, see replay
+	def replay_spool(self, send, batchSize):
+		delivered = 0
+
+		while True:
+			# Ending the outage under the lock keeps a job from spooling an
+			# update that nobody replays
+			fd = self.lock_spool()
+			try:
+				if not os.path.isfile(self.replayFile):
+					if not os.path.isfile(self.spoolFile):
+						return (delivered, 0, self.end_outage())
+					os.replace(self.spoolFile, self.replayFile)
+			finally:
+				self.unlock_spool(fd)
+
+			events = self.read_events(self.replayFile)
+			sent   = 0
+			while sent < len(events):
+				batch = events[sent:sent + batchSize]
+				for event in batch:
+					if not send(event):
+						break
+					sent += 1
+					delivered += 1
+				else:
+					self.write_events(self.replayFile, events[sent:])
+					continue
+				break
+
+			if sent < len(events):
+				# Put what's left back in front of updates spooled since
+				fd = self.lock_spool()
+				try:
+					self.write_events(self.spoolFile, events[sent:] + self.read_events(self.spoolFile))
+					os.remove(self.replayFile)
+				finally:
+					self.unlock_spool(fd)
+				return (delivered, self.pending(), False)
+
+			os.remove(self.replayFile)
@@ -0,0 +1,61 @@
+# Pack a report too large for the Job Monitor into gzipped, base64 encoded
+# chunks that are posted to the same job run, and put them back together.
+# Each chunk starts with a line such as
+#
+#	JM_REPORT gzip+base64 part 2 of 3 sha1 0beec7b5ea3f
+#
+# followed by its share of the encoded report on one line. The sha1 is of
+# the report itself, so chunks from different reports aren't mixed up.
+#
+# Example:
+#	chunks = pack_report(message)
+#	...
+#	message = unpack_report(chunks)
+#
+# Initial version 10/17/26 TME
+# Last updated 10/17/26 TME
+
+import base64, gzip, hashlib, re
+
+chunkHeader = re.compile(r'^JM_REPORT gzip\+base64 part (\d+) of (\d+) sha1 ([0-9a-f]+)\s*$', re.M)
+
+# Returns a report as a list of chunks, each no more than maxSize bytes
+def pack_report(message, maxSize = 65535):
+	report  = message.encode('utf-8')
+	digest  = hashlib.sha1(report).hexdigest()[:12]
+	encoded = base64.b64encode(gzip.compress(report, 9)).decode('ascii')
+
+	# Room for the header line, in whole base64 quanta
+	chunkSize = (maxSize - 100) // 4 * 4
+	parts     = [encoded[start:start + chunkSize] for start in range(0, len(encoded), chunkSize)]
+
+	return [f'JM_REPORT gzip+base64 part {part} of {len(parts)} sha1 {digest}\n{data}' for (part, data) in enumerate(parts, 1)]
+
+# Put chunks from pack_report back together, in any order. A chunk may
+# come more than once, e.g. after a replay from the outbox.
+# Returns the report, or raises ValueError if chunks are missing or don't match.
+def unpack_report(chunks):
+	parts  = {}
+	total  = False
+	digest = False
+
+	for chunk in chunks:
+		found = chunkHeader.search(chunk)
+		if not found:
+			raise ValueError('Not a Job Monitor report chunk')
+
+		(part, count, chunkDigest) = (int(found.group(1)), int(found.group(2)), found.group(3))
+		if digest and (chunkDigest != digest or count != total):
+			raise ValueError(f'Chunk {part} is from a different report')
+		(total, digest) = (count, chunkDigest)
+		parts[part] = chunk[found.end():].strip()
+
+	missing = [part for part in range(1, (total or 0) + 1) if part not in parts]
+	if not parts or missing:
+		raise ValueError(f'Missing chunks {missing}')
+
+	report = gzip.decompress(base64.b64decode(''.join(parts[part] for part in range(1, total + 1))))
+	if hashlib.sha1(report).hexdigest()[:12] != digest:
+		raise ValueError('Report does not match its sha1')
+
+	return report.decode('utf-8')
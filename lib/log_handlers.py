@@ -0,0 +1,148 @@
+# Logging for notify. Each job code gets its own logger, writing to its own
+# log file through a queue, so a log() call only puts the record on the
+# queue and a listener thread does the writing. The file is written as JSON
+# lines, one record per line, through a buffer that is flushed by the first
+# record after flushEvery seconds, by errors and at exit. A file that grows
+# past maxBytes or gets older than maxAge seconds is renamed with the time it
+# was rotated and a new one started.
+#
+# Example:
+#	logger = get_logger('weed_files', f'{logDir}/weed_files_202610')
+#	logger.info('Removed /dropbox/file.xml')
+#
+# Initial version 10/17/26 TME
+# Last updated 10/17/26 TME
+
+import atexit, json, logging, os, queue, threading
+from datetime import datetime
+from logging.handlers import QueueHandler, QueueListener
+from time import time
+
+# Loggers already set up, by job code and log file, with their listeners
+loggers     = {}
+loggersLock = threading.Lock()
+
+class json_lines_handler(logging.Handler):
+
+	# Parameters
+	#   logFile      Log file to write to
+	#   jobCode      Job code recorded with each record
+	#   maxBytes     Rotate the file once it's this large, 0 to not rotate on size
+	#   maxAge       Rotate the file once it's this many seconds old, 0 to not rotate on age
+	#   flushEvery   Seconds between flushes of the buffer
+	#   bufferSize   Bytes buffered between writes to the file
+	def __init__(self, logFile, jobCode, maxBytes = 104857600, maxAge = 0, flushEvery = 5, bufferSize = 65536):
+		logging.Handler.__init__(self)
+		self.logFile    = logFile
+		self.jobCode    = jobCode
+		self.maxBytes   = maxBytes
+		self.maxAge     = maxAge
+		self.flushEvery = flushEvery
+		self.bufferSize = bufferSize
+		self.stream     = False
+		self.open_file()
+
+	def open_file(self):
+		self.stream    = open(self.logFile, 'a', encoding = 'utf-8', buffering = self.bufferSize)
+		self.size      = self.stream.tell()
+		self.started   = self.first_record_time() if self.size else time()
+		self.lastFlush = time()
+
+	# Returns when the log file was started, from the time of its first
+	# record. Files written before the JSON lines format start with the
+	# time as text. The file's modification time changes with every write,
+	# so it's no use for this.
+	def first_record_time(self):
+		try:
+			with open(self.logFile, encoding = 'utf-8', errors = 'replace') as log:
+				firstLine = log.readline()
+			if firstLine.startswith('{'):
+				return datetime.fromisoformat(json.loads(firstLine)['time']).timestamp()
+			return datetime.strptime(firstLine[:19], '%Y-%m-%d %H:%M:%S').timestamp()
+		except Exception:
+			return time()
+
+	# Rename the file with the time it was rotated and start a new one
+	def rotate(self):
+		self.stream.close()
+		rotatedFile = f"{self.logFile}.{datetime.now().strftime('%Y%m%d%H%M%S')}"
+		count = 1
+		while os.path.exists(rotatedFile):
+			rotatedFile = f"{self.logFile}.{datetime.now().strftime('%Y%m%d%H%M%S')}_{count}"
+			count += 1
+		os.rename(self.logFile, rotatedFile)
+		self.open_file()
+
+	def emit(self, record):
+		try:
+			line = json.dumps({'time': datetime.fromtimestamp(record.created).isoformat(timespec = 'milliseconds'),
+			                   'level': record.levelname, 'job': self.jobCode,
+			                   'message': record.getMessage()}, ensure_ascii = False) + '\n'
+
+			lineSize = len(line.encode('utf-8'))
+			if (self.maxBytes and self.size and self.size + lineSize > self.maxBytes) or (self.maxAge and time() - self.started > self.maxAge):
+				self.rotate()
+
+			self.stream.write(line)
+			self.size += lineSize
+
+			if record.levelno >= logging.ERROR or time() - self.lastFlush >= self.flushEvery:
+				self.flush()
+		except Exception:
+			self.handleError(record)
+
+	def flush(self):
+		if self.stream:
+			self.stream.flush()
+			self.lastFlush = time()
+
+	def close(self):
+		if self.stream:
+			self.stream.close()
+			self.stream = False
+		logging.Handler.close(self)
+
+# Puts records on the queue as they are. The standard QueueHandler formats
+# and copies each record, which the listener's handler doesn't need as it's
+# the only one to see them.
+class record_queue_handler(QueueHandler):
+
+	def prepare(self, record):
+		record.msg       = record.getMessage()
+		record.args      = None
+		record.exc_info  = None
+		record.exc_text  = None
+		return record
+
+# Returns the logger for a job code, setting it up the first time. A job
+# code that logs to a different file gets a logger of its own.
+def get_logger(jobCode, logFile, maxBytes = 104857600, maxAge = 0):
+	with loggersLock:
+		if (jobCode, logFile) in loggers:
+			return loggers[(jobCode, logFile)][0]
+
+		logger = logging.getLogger(f'notify.{jobCode}.{os.path.basename(logFile)}')
+		logger.setLevel(logging.INFO)
+		logger.propagate = False
+
+		recordQueue = queue.SimpleQueue()
+		logger.addHandler(record_queue_handler(recordQueue))
+
+		listener = QueueListener(recordQueue, json_lines_handler(logFile, jobCode, maxBytes, maxAge))
+		listener.start()
+		loggers[(jobCode, logFile)] = (logger, listener)
+
+		return logger
+
+# Write out what's queued and close the log files
+def stop_loggers():
+	with loggersLock:
+		for (logger, listener) in loggers.values():
+			for handler in logger.handlers[:]:
+				logger.removeHandler(handler)
+			listener.stop()
+			for handler in listener.handlers:
+				handler.close()
+		loggers.clear()
+
+atexit.register(stop_loggers)
@@ -1,7 +1,7 @@
 # Common LTS script routines and variables 
 #
 # Initial version 06/22/18 TME
-# Last updated 10/27/23 TME
+# Last updated 10/17/26 TME
 
 #
 # Load modules, set/initialize global variables
@@ -59,6 +59,30 @@ try:
 	gpgCmd = config['gpgCmd']
 except:
 	print('Gpg parameters are not set')
+try:
+	notifyBackground = config['notifyBackground']
+except:
+	notifyBackground = False
+try:
+	notifyDeadline = config['notifyDeadline']
+except:
+	notifyDeadline = 300
+try:
+	notifyKeepMessages = config['notifyKeepMessages']
+except:
+	notifyKeepMessages = 100
+try:
+	notifyCompress  = config['notifyCompress']
+	notifyMaxChunks = config['notifyMaxChunks']
+except:
+	notifyCompress  = False
+	notifyMaxChunks = 20
+try:
+	notifyLogMaxBytes = config['notifyLogMaxBytes']
+	notifyLogMaxAge   = config['notifyLogMaxAge']
+except:
+	notifyLogMaxBytes = 104857600
+	notifyLogMaxAge   = 0
 		
 #
 # Functions
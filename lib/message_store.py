@@ -0,0 +1,120 @@
+# Bounded store for the pass, warn and fail messages a notify object
+# reports. Each type keeps a count and its first and last keep messages, so
+# a verbose run that logs every file it touches doesn't grow without limit.
+# Once a type has more messages than that, the full message stream, in the
+# order it was logged, is also written to a gzipped spill file.
+#
+# Initial version 10/17/26 TME
+# Last updated 10/17/26 TME
+
+import atexit, gzip
+from collections import deque
+
+# Message types, in the order they are reported
+messageTypes = ('fail', 'warn', 'pass')
+
+class message_store:
+
+	# Parameters
+	#   spillFile    Gzipped file for the full message stream, created when needed
+	#   keep         Messages of each type kept from the start and from the end
+	#   maxMessage   Longest message, in characters, kept for the report once
+	#                the spill file has the full text
+	def __init__(self, spillFile, keep = 100, maxMessage = 2000):
+		self.spillFile  = spillFile
+		self.keep       = keep
+		self.maxMessage = maxMessage
+		self.spill      = False
+		self.clear()
+		atexit.register(self.close)
+
+	# Forget the messages, the spill file is kept open for the rest of the run
+	def clear(self):
+		self.counts = dict.fromkeys(messageTypes, 0)
+		self.first  = {msgType: [] for msgType in messageTypes}
+		self.last   = {msgType: deque(maxlen = self.keep) for msgType in messageTypes}
+
+		# Every message, in order, until the spill file is started
+		self.logged = []
+
+	# Add a message of type fail, warn or pass
+	def add(self, msgType, message):
+		self.counts[msgType] += 1
+
+		if self.spill:
+			self.spill.write(f'{msgType}\t{message}\n')
+		else:
+			self.logged.append((msgType, message))
+			if self.counts[msgType] > 2 * self.keep:
+				self.start_spill()
+
+		if self.spill and len(message) > self.maxMessage:
+			message = message[:self.maxMessage] + '...'
+
+		if len(self.first[msgType]) < self.keep:
+			self.first[msgType].append(message)
+		else:
+			self.last[msgType].append(message)
+
+	# Start the spill file with the messages logged so far
+	def start_spill(self):
+		self.spill = gzip.open(self.spillFile, 'at', encoding = 'utf-8')
+		for (msgType, message) in self.logged:
+			self.spill.write(f'{msgType}\t{message}\n')
+		self.logged = []
+
+	def close(self):
+		if self.spill:
+			self.spill.close()
+			self.spill = False
+
+	def count(self, msgType):
+		return self.counts[msgType]
+
+	# Returns a type's messages, one per line, in no more than budget bytes.
+	# Messages are taken from the start and then from the end, with a line
+	# saying how many were left out in between. The message that runs past
+	# the budget is cut short to fill what's left of it. The spill file is
+	# started if anything had to be left out.
+	def text(self, msgType, budget = 65535):
+		first   = self.first[msgType]
+		last    = self.last[msgType]
+		omitted = self.counts[msgType] - len(first) - len(last)
+
+		# Leave room for the line about left out messages
+		budget -= 200 + len(self.spillFile.encode())
+
+		head = []
+		cut  = False
+		for message in first:
+			size = len(message.encode()) + 1
+			if size > budget:
+				if budget > 100:
+					head.append(message.encode()[:budget - 4].decode('utf-8', 'ignore') + '...')
+					cut    = True
+					budget = 0
+				break
+			head.append(message)
+			budget -= size
+
+		tail = []
+		if len(head) == len(first):
+			for message in reversed(last):
+				size = len(message.encode()) + 1
+				if size > budget:
+					break
+				tail.append(message)
+				budget -= size
+			tail.reverse()
+
+		omitted += len(first) + len(last) - len(head) - len(tail)
+
+		# Messages left out or cut short to fit are kept in the spill file
+		if (omitted or cut) and not self.spill:
+			self.start_spill()
+		if omitted:
+			head.append(f'... {omitted} more {msgType} messages, all messages are in {self.spillFile}')
+		elif cut:
+			head.append(f'... all messages are in {self.spillFile}')
+
+		return '\n'.join(head + tail) + '\n' if head or tail else ''
@@ -1,13 +1,14 @@
 # Use this module for script reporting
 #
 # Initial version 11/06/18 TME
-# Last updated 04/13/23 TME
+# Last updated 10/17/26 TME
 
 #
 # Load modules, set/initialize global variables
 #
-import logging, os, sys
-from time import sleep
+import atexit, os, sys, threading
+from collections import deque
+from time import sleep, time
 import requests
 
 # To help find other directories that might hold modules or config files
@@ -17,13 +18,33 @@ libDir = os.path.dirname(os.path.realpath(__file__))
 commonBin = libDir.replace('lib', 'bin')
 logDir    = libDir.replace('lib', 'log')
 sys.path.append(commonBin)
-from ltstools import adminMailTo, adminMailFrom, get_date_time_stamp, jobMonitor, send_mail
+from ltstools import adminMailTo, adminMailFrom, get_date_time_stamp, jobMonitor, notifyBackground, notifyDeadline, notifyKeepMessages, notifyCompress, notifyLogMaxAge, notifyLogMaxBytes, notifyMaxChunks, send_mail
+from jm_outbox import jm_outbox
+from jm_report import pack_report
+from log_handlers import get_logger
+from message_store import message_store
+
+# Job Monitor updates that couldn't be sent wait here to be replayed
+jmOutbox = jm_outbox(logDir)
+
+# Largest message the Job Monitor takes
+maxReportSize = 65535
+
+# Attempts the background thread makes to send an update, and the wait
+# before the first retry, in seconds. The wait is doubled with each retry.
+backgroundTries = 3
+backgroundWait  = 5
+
+# Running statuses, least to most severe, for combining queued updates
+runningStatuses = ('RUNNING', 'RUNNING_WARNING', 'RUNNING_ERROR')
 
 # Use this class to track pass, fail and warning script messages and
 # to report script results. 
 class notify:
 
-	def __init__(self, notifyMethod, jobCode = False, logFile = False):
+	# Set background to True to send Job Monitor updates from a background
+	# thread, see post_status. Defaults to notifyBackground in main.yaml.
+	def __init__(self, notifyMethod, jobCode = False, logFile = False, background = notifyBackground):
 
 		if notifyMethod == 'monitor' or notifyMethod == 'monitor+log':
 			if jobCode:
@@ -40,21 +61,28 @@ class notify:
 				print('A path to a log file must be set to log messages')
 				return None
 
-			logging.basicConfig(level=logging.INFO,
-								format='%(asctime)s %(levelname)s %(message)s',
-								filename=logFile,
-								filemode='a')
+			# Each job code logs to its own file from a background thread
+			self.logger = get_logger(jobCode or os.path.basename(logFile), logFile, notifyLogMaxBytes, notifyLogMaxAge)
 
 		# Notification method
 		self.notifyMethod = notifyMethod
 	
-		# To group messages by status type
-		self.msgPass   = ''
-		self.msgWarn   = ''
-		self.msgFail   = ''
-		self.countPass = 0
-		self.countWarn = 0
-		self.countFail = 0
+		# To group messages by status type. Long runs spill their messages
+		# to a gzipped file in the log directory.
+		spillName     = jobCode or (os.path.basename(logFile) if logFile else 'notify')
+		spillFile     = f'{logDir}/{spillName}_messages_' + get_date_time_stamp() + '.gz'
+		self.messages = message_store(spillFile, notifyKeepMessages)
+
+		# Background Job Monitor delivery
+		self.background  = background
+		self.deadline    = notifyDeadline
+		self.jmQueue     = deque()
+		self.jmInFlight  = False
+		self.jmSpooling  = False
+		self.jmEndTime   = False
+		self.jmThread    = False
+		self.jmSession   = False
+		self.jmCondition = threading.Condition()
 
 	# Print message and save it as a fail, warn or pass type
 	def log(self, type, message, echo = False):
@@ -62,21 +90,32 @@ class notify:
 		if echo: print(message)
 
 		if type == 'fail':
-			self.countFail += 1
-			self.msgFail   += message + '\n'
-			if 'log' in self.notifyMethod: logging.error(message)
+			self.messages.add(type, message)
+			if 'log' in self.notifyMethod: self.logger.error(message)
 		elif type == 'warn':
-			self.countWarn += 1
-			self.msgWarn   += message + '\n'
-			if 'log' in self.notifyMethod: logging.warn(message)
+			self.messages.add(type, message)
+			if 'log' in self.notifyMethod: self.logger.warning(message)
 		elif type == 'pass':
-			self.countPass += 1
-			self.msgPass   += message + '\n'
-			if 'log' in self.notifyMethod: logging.info(message)
+			self.messages.add(type, message)
+			if 'log' in self.notifyMethod: self.logger.info(message)
 		else:
-			if 'log' in self.notifyMethod: logging.info(message)
+			if 'log' in self.notifyMethod: self.logger.info(message)
+
+	# Message counts by type
+	@property
+	def countPass(self):
+		return self.messages.count('pass')
 
-	# Report, or send, result message
+	@property
+	def countWarn(self):
+		return self.messages.count('warn')
+
+	@property
+	def countFail(self):
+		return self.messages.count('fail')
+
+	# Report, or send, result message. Failures, then warnings, then passes
+	# get what room is left under the Job Monitor's size limit.
 	# Any messages are cleared
 	def report(self, stage, echo = False, header = False):
 		returnCode = True
@@ -88,23 +127,31 @@ class notify:
 		else:
 			message = ''
 
-		# Collect messages and figure out result
-		if self.msgFail:
-			message   += 'Failed\n' + self.msgFail + '\n'
+		# Collect messages and figure out result. The budget leaves room
+		# for the section headings.
+		budget  = maxReportSize - len(message.encode()) - 50
+		msgFail = self.messages.text('fail', budget)
+		budget -= len(msgFail.encode())
+		msgWarn = self.messages.text('warn', budget)
+		budget -= len(msgWarn.encode())
+		msgPass = self.messages.text('pass', budget)
+
+		if msgFail:
+			message   += 'Failed\n' + msgFail + '\n'
 			statusMsg  = 'Had failures'
 			statusCode = 'FAILED'
 
-		if self.msgWarn:
-			if self.msgFail:
+		if msgWarn:
+			if msgFail:
 				message += '\n'
 			else:
 				statusMsg  = 'Had warnings'
 				statusCode = 'WARNING'
-			message += 'Warnings\n' + self.msgWarn + '\n'
+			message += 'Warnings\n' + msgWarn + '\n'
 
-		if self.msgPass:
-			if self.msgWarn or self.msgFail: message += '\nSuccessful\n'
-			message += self.msgPass + '\n'
+		if msgPass:
+			if msgWarn or msgFail: message += '\nSuccessful\n'
+			message += msgPass + '\n'
 
 		# Status code is also dependent on stage
 		if stage == 'start':
@@ -126,19 +173,23 @@ class notify:
 			else:
 				statusCode = 'COMPLETED_' + statusCode
 
-		# Print and report status result as specified
-		if 'monitor' in self.notifyMethod: self.notifyJM(self.jobCode, statusCode, message)
+		# Print and report status result as specified. In the background
+		# only a completed job waits for its updates to be sent.
+		if 'monitor' in self.notifyMethod:
+			if self.background:
+				self.post_status(statusCode, message)
+				if stage == 'complete':
+					self.flush(self.deadline)
+			else:
+				self.notifyJM(self.jobCode, statusCode, message)
 		if echo:
 			print(statusMsg)
 			print(message)
 
-		# Clear messages
-		self.msgPass   = ''
-		self.msgWarn   = ''
-		self.msgFail   = ''
-		self.countPass = 0
-		self.countWarn = 0
-		self.countFail = 0
+		# Clear messages, a finished job is done with its spill file
+		self.messages.clear()
+		if stage in ('complete', 'stopped'):
+			self.messages.close()
 
 		return returnCode
 
@@ -167,7 +218,9 @@ class notify:
 	#
 	#   noRetries     Do not retry if Job Monitor fails to respond
 	#
-	def notifyJM(self, jobCode, statusCode, message = 'none', runId = False, noRetries = False):
+	#   spool         Save the update to the outbox if it can't be sent
+	#
+	def notifyJM(self, jobCode, statusCode, message = 'none', runId = False, noRetries = False, spool = True):
 		httpError = False
 
 		# Number of attempts to notify the Job Monitor
@@ -176,61 +229,256 @@ class notify:
 		# Wait, in seconds, between tries. It will be doubled with each retry.
 		retryWait = 60
 
-		if runId:
-			notifyJmUrl = '%s/set_job_status/job_code/%s/status_code/%s/run_id/%s' % (jobMonitor, jobCode, statusCode, runId)
-		else:
-			notifyJmUrl = '%s/set_job_status/job_code/%s/status_code/%s' % (jobMonitor, jobCode, statusCode)
-
-		# If message is too large, write it to disk and report it
-		if message:
-			msgSize = len(message)
-			if msgSize > 65535:
-				msgInfo = self.write_log(message, logDir, jobCode)
-				message = f'The results message was {msgSize} bytes which exceeds the size limitation of 65535 bytes. ' + msgInfo
-				print(message)
-		
-		# Post status to the Job Monitor. Multiple attempts might be made.
-		for loopCount in range(1, (maxTries + 1)):
-			try:
-				response = requests.post(notifyJmUrl, data = message, timeout = 15)
-				
-				if response.status_code == 200:
-					(runId, discard) = response.text.split(',')
-					httpError = False
-					break
-				else:
-					httpError = response.text
+		# During an outage, updates saved earlier go first. If they can't be
+		# sent this one is saved after them.
+		if spool and not self.catch_up():
+			msgReturn = f'The Job Monitor is down, the update was saved to {jmOutbox.spoolFile}'
+			self.spool_status(jobCode, statusCode, message, runId, msgReturn)
+			return msgReturn
 
-			except Exception as e:
-				httpError = e
+		# A message that is too large is compressed into chunks or written to disk
+		bodies = self.jm_bodies(jobCode, message)
+
+		# Post status to the Job Monitor, a chunk at a time. Later chunks go
+		# to the job run the first one started. Multiple attempts might be
+		# made. The background thread reuses its connection to the Job Monitor.
+		for body in bodies:
+			notifyJmUrl = self.jm_url(jobCode, statusCode, runId)
+			for loopCount in range(1, (maxTries + 1)):
+				(postRunId, httpError) = self.post_jm(notifyJmUrl, body)
+				if not httpError:
+					runId = postRunId
+					break
 
-			# Retry unless asked not to
-			if noRetries:
+				# Retry unless asked not to. During an outage the update goes
+				# straight to the outbox rather than holding up the job.
+				if noRetries or (spool and jmOutbox.in_outage()):
+					break
+				else:
+					if loopCount < maxTries:
+						msgWarn = f'The Job Monitor did not respond. Another attempt will be made after in {retryWait} seconds.'
+						print(msgWarn)
+						if 'log' in self.notifyMethod: self.logger.warning(msgWarn)
+						sleep(retryWait)
+						retryWait += retryWait
+
+			if httpError:
 				break
-			else:
-				if loopCount < maxTries:
-					msgWarn = f'The Job Monitor did not respond. Another attempt will be made after in {retryWait} seconds.'
-					print(msgWarn)
-					if 'log' in self.notifyMethod: logging.warn(msgWarn)
-					sleep(retryWait)
-					retryWait += retryWait
-
-		# If unable to report to the Job Monitor, write message to disk and then send mail
+
+		# If unable to report to the Job Monitor, save the update to the outbox.
+		# Chunks are made again when it's replayed.
 		if httpError:
 			msgReturn  = 'Failed to notify the Job Monitor with a url of %s\n' % notifyJmUrl
 			msgReturn += 'Http error was %s.' % (httpError)
 
-			if message:
-				msgInfo   = self.write_log(message, logDir, jobCode)
-				msgReturn += f'\n\n{msgInfo}'
-
-			mailTo   = adminMailTo
-			mailFrom = adminMailFrom
-			send_mail(mailTo, mailFrom, 'Failed to notify the Job Monitor', msgReturn)				
+			if spool:
+				self.spool_status(jobCode, statusCode, message if len(bodies) > 1 else bodies[0], runId, msgReturn)
 			return msgReturn
 
 		return runId
 
+	# Returns the bodies to post for a message. A message over the Job
+	# Monitor's size limit is gzipped into chunks if notifyCompress is set
+	# and it fits in notifyMaxChunks of them. Otherwise it's written to a
+	# log file and a note of where to find it is sent instead.
+	def jm_bodies(self, jobCode, message):
+		if not message:
+			return [message]
+
+		msgSize = len(message.encode())
+		if msgSize <= maxReportSize:
+			return [message]
+
+		if notifyCompress:
+			chunks = pack_report(message, maxReportSize)
+			if len(chunks) <= notifyMaxChunks:
+				return chunks
+
+		msgInfo = self.write_log(message, logDir, jobCode)
+		message = f'The results message was {msgSize} bytes which exceeds the size limitation of {maxReportSize} bytes. ' + msgInfo
+		print(message)
+		return [message]
+
+	# Job Monitor url for a status update
+	def jm_url(self, jobCode, statusCode, runId = False):
+		if runId:
+			return '%s/set_job_status/job_code/%s/status_code/%s/run_id/%s' % (jobMonitor, jobCode, statusCode, runId)
+		return '%s/set_job_status/job_code/%s/status_code/%s' % (jobMonitor, jobCode, statusCode)
+
+	# Make a single post to the Job Monitor. The background thread and
+	# replays reuse their connection to the Job Monitor.
+	# Returns the run ID and False, or False and the error.
+	def post_jm(self, notifyJmUrl, message, session = False):
+		poster = session or self.jmSession or requests
+		try:
+			response = poster.post(notifyJmUrl, data = message, timeout = 15)
+			if response.status_code == 200:
+				(runId, discard) = response.text.split(',')
+				return (runId, False)
+			return (False, response.text)
+		except Exception as e:
+			return (False, e)
+
+	# Post a message, a chunk at a time, with no retries.
+	# Returns the run ID and False, or False and the error.
+	def post_bodies(self, jobCode, statusCode, message, runId = False, session = False):
+		for body in self.jm_bodies(jobCode, message):
+			notifyJmUrl = self.jm_url(jobCode, statusCode, runId)
+			(postRunId, httpError) = self.post_jm(notifyJmUrl, body, session)
+			if httpError:
+				return (False, httpError)
+			runId = postRunId
+		return (runId, False)
+
+	# Save an update that couldn't be sent to the outbox. The admin is
+	# mailed when an outage starts, not for every update that follows.
+	def spool_status(self, jobCode, statusCode, message, runId, error):
+		jmOutbox.add(jobCode, statusCode, message, runId)
+
+		if jmOutbox.start_outage():
+			msgMail  = f'{error}\n\nJob Monitor updates from all jobs are being saved to {jmOutbox.spoolFile} '
+			msgMail += 'until the Job Monitor is back. Send them with "notifyJM.py --replay". '
+			msgMail += 'This is the only message sent for this outage.'
+			send_mail(adminMailTo, adminMailFrom, 'Failed to notify the Job Monitor', msgMail)
+
+	# Send the updates waiting in the outbox, oldest first, stopping at the
+	# first one the Job Monitor doesn't take. The admin is mailed when this
+	# ends an outage.
+	# Returns the number of updates sent and still waiting.
+	def replay_outbox(self, batchSize = 50):
+		session = requests.Session()
+
+		def send(event):
+			(runId, httpError) = self.post_bodies(event['jobCode'], event['statusCode'], event.get('message') or 'none', event.get('runId'), session)
+			return not httpError
+
+		try:
+			(sent, waiting, ended) = jmOutbox.replay(send, batchSize)
+		finally:
+			session.close()
+
+		if ended:
+			send_mail(adminMailTo, adminMailFrom, 'The Job Monitor is back', f'The Job Monitor is responding again. {sent} saved updates were sent to it.')
+		return (sent, waiting)
+
+	# Replay the outbox if an outage is under way.
+	# Returns True if there's nothing left to send ahead of a new update.
+	def catch_up(self):
+		if not jmOutbox.in_outage():
+			return True
+		(sent, waiting) = self.replay_outbox()
+		return not waiting
+
+	# Queue a Job Monitor update for the background thread, starting it if
+	# needed. A running update still waiting to be sent is combined with
+	# the new one, keeping the most severe status. Both messages are kept
+	# if they fit in a report together, otherwise only the new one.
+	def post_status(self, statusCode, message):
+		with self.jmCondition:
+			if statusCode in runningStatuses and self.jmQueue and self.jmQueue[-1][0] in runningStatuses:
+				(queuedStatus, queuedMessage) = self.jmQueue.pop()
+				statusCode = max(queuedStatus, statusCode, key = runningStatuses.index)
+				if len(queuedMessage.encode()) + len(message.encode()) <= maxReportSize:
+					message = queuedMessage + message
+
+			self.jmQueue.append((statusCode, message))
+			self.jmCondition.notify_all()
+
+			if not self.jmThread:
+				self.jmSession = requests.Session()
+				self.jmThread  = threading.Thread(target = self.deliver, name = f'notify-{self.jobCode}', daemon = True)
+				self.jmThread.start()
+				atexit.register(self.flush, self.deadline)
+
+	# Background thread, sends queued updates in order. An update that
+	# can't be sent is saved to the outbox, here or by flush if its deadline
+	# passes while the update is still being sent.
+	def deliver(self):
+		while True:
+			with self.jmCondition:
+				while not self.jmQueue:
+					self.jmCondition.wait()
+				update = self.jmQueue.popleft()
+				self.jmInFlight = update
+
+			(statusCode, message) = update
+			try:
+				httpError = self.deliver_update(statusCode, message)
+			except Exception as e:
+				httpError = e
+
+			# Save a failed update unless flush already has
+			with self.jmCondition:
+				self.jmSpooling = bool(httpError) and self.jmInFlight is update
+				self.jmInFlight = False
+				self.jmCondition.notify_all()
+
+			if self.jmSpooling:
+				try:
+					msgWarn = f'Failed to send {statusCode} to the Job Monitor: {httpError}'
+					if 'log' in self.notifyMethod: self.logger.error(msgWarn)
+					self.spool_status(self.jobCode, statusCode, message, False, msgWarn)
+				finally:
+					with self.jmCondition:
+						self.jmSpooling = False
+						self.jmCondition.notify_all()
+
+	# Send an update from the background thread. A few quick retries are
+	# made, none past flush's deadline and none during an outage.
+	# Returns False once sent, otherwise the error.
+	def deliver_update(self, statusCode, message):
+		if not self.catch_up():
+			return 'The Job Monitor is down, updates saved earlier are still waiting'
+
+		retryWait = backgroundWait
+		for loopCount in range(1, (backgroundTries + 1)):
+			(runId, httpError) = self.post_bodies(self.jobCode, statusCode, message)
+			if not httpError:
+				return False
+
+			if loopCount == backgroundTries or jmOutbox.in_outage():
+				break
+			with self.jmCondition:
+				if self.jmEndTime and time() + retryWait >= self.jmEndTime:
+					break
+				self.jmCondition.wait(retryWait)
+			retryWait += retryWait
+
+		return httpError
+
+	# Wait up to deadline seconds for queued Job Monitor updates to be sent.
+	# Updates that weren't sent, including one still being sent, are saved
+	# to the outbox.
+	# Returns True if everything was sent.
+	def flush(self, deadline):
+		endTime = time() + deadline
+		with self.jmCondition:
+			self.jmEndTime = endTime
+			self.jmCondition.notify_all()
+			while self.jmQueue or self.jmInFlight or self.jmSpooling:
+				remaining = endTime - time()
+				if remaining <= 0:
+					break
+				self.jmCondition.wait(remaining)
+
+			unsent = list(self.jmQueue)
+			self.jmQueue.clear()
+			if self.jmInFlight:
+				unsent.insert(0, self.jmInFlight)
+				self.jmInFlight = False
+
+			# An update the thread is saving is older than these
+			while self.jmSpooling:
+				self.jmCondition.wait()
+			self.jmEndTime = False
+
+		for (statusCode, message) in unsent:
+			msgWarn = f'The Job Monitor update {statusCode} was not sent within {deadline} seconds and was saved to {jmOutbox.spoolFile}'
+			if 'log' in self.notifyMethod: self.logger.warning(msgWarn)
+			self.spool_status(self.jobCode, statusCode, message, False, msgWarn)
+
+		return not unsent
+
 	# Write message to a new log file
 	def write_log(self, message, logDir, jobCode):
 		from socket import getfqdn
@@ -0,0 +1,74 @@
+# Token bucket rate limiter used to keep our Alma API requests under
+# Alma's per second threshold. The bucket is kept in a small state file
+# locked with flock so that all threads and all scripts on the same host
+# draw from the same bucket.
+#
+# Initial version 10/17/26 TME
+# Last updated 10/17/26 TME
+
+import fcntl, os, struct
+from time import sleep, time
+
+# State file holds the current token level and when it was last updated
+stateFormat = 'dd'
+stateSize   = struct.calcsize(stateFormat)
+
+class rate_limiter:
+
+	# Parameters
+	#   rate        Tokens (requests) added to the bucket per second
+	#   stateFile   Full path to the shared state file
+	#   burst       Optional, bucket size. Defaults to rate. The bucket holds
+	#               at least one token so that a rate under 1 still lets
+	#               requests through.
+	def __init__(self, rate, stateFile, burst = False):
+		self.rate      = float(rate)
+		self.stateFile = stateFile
+		self.waitTime  = 0.0
+		self.burst     = max(float(burst or rate), 1.0)
+
+	# Wait until a token is available and take it
+	def acquire(self, tokens = 1):
+		while True:
+			wait = self.update(-tokens)
+			if wait <= 0:
+				break
+			self.waitTime += wait
+			sleep(wait)
+
+	# Empty the bucket and leave it in debt for the specified seconds.
+	# Use after Alma reports that the per second threshold was exceeded.
+	def drain(self, seconds = 1):
+		self.update(False, -(self.rate * seconds))
+
+	# Refill the bucket for the time passed since the last update and then
+	# add tokens to the level (negative to take them) or set the level outright.
+	# Returns 0 on success, otherwise the seconds to wait for enough tokens.
+	def update(self, tokens, level = False):
+		wait = 0
+
+		fd = os.open(self.stateFile, os.O_RDWR | os.O_CREAT, 0o666)
+		try:
+			fcntl.flock(fd, fcntl.LOCK_EX)
+			now   = time()
+			state = os.pread(fd, stateSize, 0)
+
+			if level is False:
+				if len(state) == stateSize:
+					(level, stamp) = struct.unpack(stateFormat, state)
+					level = min(self.burst, level + ((now - stamp) * self.rate))
+				else:
+					level = self.burst
+
+				if tokens:
+					if level + tokens >= 0:
+						level += tokens
+					else:
+						wait = -(level + tokens) / self.rate
+
+			os.pwrite(fd, struct.pack(stateFormat, level, now), 0)
+		finally:
+			# Closing the file also releases the lock
+			os.close(fd)
+
+		return wait
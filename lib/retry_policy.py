@@ -0,0 +1,125 @@
+# Retry policy and circuit breaker used by api_session when an Alma API
+# request fails.
+#
+# Initial version 10/17/26 TME
+# Last updated 10/17/26 TME
+
+import random, threading
+from email.utils import parsedate_to_datetime
+from time import time
+
+# Use this class to decide if, and when, a failed request should be tried again.
+# Replace api_session.retryPolicy with a subclass to change the behavior.
+class retry_policy:
+
+	# Http status codes that might succeed if tried again
+	retryStatusCodes = (408, 429, 500, 502, 503, 504)
+
+	# Parameters
+	#   baseWait   Wait, in seconds, before the first retry. Doubled with each retry.
+	#   maxWait    Longest wait, in seconds, between retries
+	#   jitter     Randomize waits so that concurrent requests don't retry in lockstep
+	def __init__(self, baseWait = 2, maxWait = 60, jitter = True):
+		self.baseWait = baseWait
+		self.maxWait  = maxWait
+		self.jitter   = jitter
+
+	# Returns the seconds to wait before the next attempt or False if the
+	# request should not be retried.
+	#
+	# Parameters
+	#   attempt      The attempt that just failed, starting at 1
+	#   statusCode   Http status code or False if no response was received
+	#   text         Response body or False
+	#   headers      Response headers or False
+	def retry_wait(self, attempt, statusCode, text = False, headers = False):
+
+		# No response at all (timeout, connection refused, etc.)
+		if not statusCode:
+			return self.backoff(attempt)
+
+		# Client errors such as a bad MMS ID or API key won't go away by retrying
+		if statusCode not in self.retryStatusCodes:
+			return False
+
+		# The daily API limit has been reached
+		if text and 'DAILY_THRESHOLD' in text:
+			return False
+		if headers and headers.get('X-Remaining-API-Calls') == '0':
+			return False
+
+		# Alma, or a proxy in front of it, told us how long to wait
+		if headers and headers.get('Retry-After'):
+			wait = self.retry_after(headers['Retry-After'])
+			if wait is not False:
+				return min(wait, self.maxWait)
+
+		# Over Alma's per second threshold
+		if statusCode == 429 or (text and 'PER_SECOND_THRESHOLD' in text):
+			return 1
+
+		return self.backoff(attempt)
+
+	# Exponential backoff, with full jitter if enabled
+	def backoff(self, attempt):
+		wait = min(self.maxWait, self.baseWait * (2 ** (attempt - 1)))
+		if self.jitter:
+			wait = random.uniform(wait / 2, wait)
+
+		return wait
+
+	# Convert a Retry-After header, seconds or a http date, to seconds
+	def retry_after(self, value):
+		try:
+			return max(0, float(value))
+		except ValueError:
+			pass
+
+		try:
+			return max(0, parsedate_to_datetime(value).timestamp() - time())
+		except Exception:
+			return False
+
+# Use this class to stop sending requests to a host once it is clearly down.
+# After failureLimit consecutive failures the circuit opens and requests fail
+# right away. Once resetTime seconds have passed one request is let through
+# to check on the host. A success closes the circuit again.
+# A single instance is shared by all sessions and threads in a script.
+class circuit_breaker:
+
+	def __init__(self, failureLimit = 5, resetTime = 60):
+		self.failureLimit = failureLimit
+		self.resetTime    = resetTime
+		self.hosts        = {}
+		self.lock         = threading.Lock()
+
+	# Returns True if a request to host should be attempted
+	def allow(self, host):
+		with self.lock:
+			state = self.hosts.get(host)
+			if not state or not state['openedAt']:
+				return True
+
+			# Let one request through to test the host
+			if time() - state['openedAt'] >= self.resetTime:
+				state['openedAt'] = time()
+				return True
+
+			return False
+
+	# Record the outcome of a request to host
+	def record(self, host, success):
+		with self.lock:
+			if success:
+				self.hosts.pop(host, None)
+			else:
+				state = self.hosts.setdefault(host, {'failures': 0, 'openedAt': False})
+				state['failures'] += 1
+				if state['failures'] >= self.failureLimit and not state['openedAt']:
+					state['openedAt'] = time()
+
+	# Returns True if requests to host are currently being stopped
+	def is_open(self, host):
+		with self.lock:
+			state = self.hosts.get(host)
+			return bool(state and state['openedAt'])
@@ -0,0 +1,49 @@
+# Helpers for the local SQLite databases: the API and barcode caches, the
+# Alma mirror and the invoice index. A SQLite connection can't be shared
+# between threads, so each thread gets its own, in WAL mode so readers
+# don't wait on a writer.
+#
+# Example:
+#	connections = thread_connections(dbFile)
+#	db = connections.get()
+#	for chunk in parameter_chunks(barcodes):
+#		db.execute(f'select * from items where barcode in ({placeholders(chunk)})', chunk)
+#
+# Initial version 10/17/26 TME
+# Last updated 10/17/26 TME
+
+import sqlite3, threading
+
+# Values passed to a query at once, under SQLite's limit on query parameters
+maxParameters = 500
+
+class thread_connections:
+
+	# Parameters
+	#   dbFile    Full path to the database, created if needed
+	#   timeout   Seconds to wait for another connection's lock
+	def __init__(self, dbFile, timeout = 30):
+		self.dbFile  = dbFile
+		self.timeout = timeout
+		self.local   = threading.local()
+
+	# Returns the calling thread's connection, opening it the first time
+	def get(self):
+		db = getattr(self.local, 'db', False)
+		if not db:
+			db = sqlite3.connect(self.dbFile, timeout = self.timeout)
+			db.execute('pragma journal_mode=wal')
+			db.execute('pragma synchronous=normal')
+			self.local.db = db
+
+		return db
+
+# Yields values in lists of up to maxParameters
+def parameter_chunks(values):
+	values = list(values)
+	for start in range(0, len(values), maxParameters):
+		yield values[start:start + maxParameters]
+
+# Returns the placeholders for a list of query parameters, e.g. ?,?,?
+def placeholders(values):
+	return ','.join('?' * len(values))